@@ -2,12 +2,12 @@
 # SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
 from board import BUTTON1, CKP, CKN, D0P, D0N, D1P, D1N, D2P, D2N
 from digitalio import DigitalInOut, Direction, Pull
-import bitmaptools
 import displayio
 from displayio import Bitmap, Group, Palette, TileGrid
 import framebufferio
 import gc
 from micropython import const
+import os
 import picodvi
 import supervisor
 import sys
@@ -20,7 +20,22 @@ import usb_midi
 from adafruit_display_text import bitmap_label
 import adafruit_imageload
 
-from sb_usb_midi import find_usb_device, MIDIInputDevice
+from sb_console import ConsoleBuffer
+from sb_midi_binlog import BinaryLog
+from sb_midi_clock import ClockTracker
+from sb_midi_coalesce import Coalescer, CoalescerGroup
+from sb_midi_ctrl import ControllerDecoder, HELD, PLAIN
+from sb_midi_dispatch import CINDispatch
+from sb_midi_echo import MIDIEcho
+from sb_midi_filter import MessageFilter, RouteTable, ALL, DISPLAY, ECHO, LOG
+import sb_midi_fmt as fmt
+from sb_midi_ring import PacketRing
+from sb_midi_sysex import SysExAssembler
+from sb_note_grid import NoteGrid
+from sb_refresh import RefreshScheduler
+from sb_text_panel import HistoryPane
+from sb_ticks import ticks_diff
+from sb_usb_midi import find_usb_devices, MIDIDeviceManager
 
 
 def init_display(width, height, color_depth):
@@ -55,12 +70,15 @@ def main():
     bg_tg = TileGrid(bg_bitmap, pixel_shader=bg_palette)
     grp.append(bg_tg)
 
-    # Text label for input event data
-    event = bitmap_label.Label(FONT, text="", color=0xFFFFFF, scale=1)
-    event.line_spacing = 1.0
-    event.anchor_point = (0, 0)
-    event.anchored_position = (16, 160)  # Bottom left rounded rectangle
-    grp.append(event)
+    # Scrolling history of input events in the bottom left rounded rectangle
+    # (about 136x70 px). Each row is a TileGrid of character cells, so a new
+    # event only changes one row's tile indexes plus two y positions (no
+    # label re-layout or allocation). The pane gets redrawn along with
+    # everything else at the capped frame rate.
+    (char_w, char_h) = FONT.get_bounding_box()[:2]
+    event = HistoryPane(FONT, 136 // char_w, 70 // char_h, x=16, y=160)
+    event_add = event.add
+    grp.append(event.group)
 
     # Text label for status messages
     status = bitmap_label.Label(FONT, text="", color=0xFFFFFF, scale=1)
@@ -69,25 +87,212 @@ def main():
     status.anchored_position = (172, 160)  # Bottom right rounded rectangle
     grp.append(status)
 
+    # SysEx reassembly buffer (long dumps get truncated, but the full length
+    # is still counted)
+    sysex = SysExAssembler(256)
+    sysex_feed = sysex.feed
+
+    # Per-cable routing table. For example, on my BeatStep Pro, regular
+    # sequencer notes and CC happen on CN==0, while CN==1 has "MCU" (Mackie
+    # Control) messages. When set for "Control Mode" with the "MCU/HUI" knob
+    # sub-mode, the BSP sends relative knob turn amount events for use with
+    # DAW software. To drop those but keep everything on CN==0, you could
+    # do route_table.set(cable=1, actions=0).
+    route_table = RouteTable(ALL)
+
+    # Message filter spec from CIRCUITPY (message types, channels, note
+    # ranges, cables, and thinning rates). Edit midi_filter.cfg to tune
+    # throughput for a particular setup without changing code. If the file
+    # is missing, everything passes.
+    msg_filter = MessageFilter()
+    if msg_filter.load('/midi_filter.cfg'):
+        print('Loaded /midi_filter.cfg')
+    msg_filter.apply(route_table)
+
     # Configure button #1 as input to trigger USB bus re-connect
     button_1 = DigitalInOut(BUTTON1)
     button_1.direction = Direction.INPUT
     button_1.pull = Pull.UP
 
-    # Nested function to visualize note on/off event
-    # - chan: midi channel in 1-16
-    # - num: note number in range 21-108 (midi range of full size piano)
-    # - note_on: True for note-on event, False for note-off event
-    def visualize(chan, num, note_on):
-        if not ((1 <= chan <= 16) and (21 <= num <= 108)):
-            return
-        # Calculate coordinates for a rectangle in the background image's grid
-        # of channels and notes. These formulas come from measuring pixels
-        # in an image editor (dot grid spacing is 3px per note, 6px per chan)
-        x1 = 28 + (3 * (num - 21))
-        y1 = 16 + (6 * (chan - 1))
-        color_val = 2 if note_on else 0
-        bitmaptools.fill_region(bg_bitmap, x1, y1, x1+2, y1+5, color_val)
+    # Note grid for visualizing note on/off events. Cell changes get queued
+    # and merged, then drawn in one pass just before each scheduled refresh.
+    # At most GRID_CELLS cells get drawn per frame to bound the cost, and
+    # any leftovers get another frame.
+    grid = NoteGrid(bg_bitmap, on=2, off=0)
+    # Velocity shading mode: put MIDI_VELOCITY_SHADING = 1 in settings.toml
+    # to shade notes by velocity. This loads an 8 level ramp of the note on
+    # color into the unused background palette entries 8-15.
+    if os.getenv("MIDI_VELOCITY_SHADING", 0) and len(bg_palette) >= 16:
+        grid.use_velocity(bg_palette, first=8, levels=8)
+    grid_on = grid.note_on
+    grid_off = grid.note_off
+    grid_all_off = grid.all_off
+    GRID_CELLS = const(256)
+    def draw_grid():
+        grid.draw(GRID_CELLS)
+        if len(grid):
+            sched.mark()
+
+    # Serial log mode. Put MIDI_LOG_MODE = "binary" in settings.toml to log
+    # compact binary records (raw packet plus timestamp) rather than text.
+    # Use tools/midi_log_decode.py on a capture to turn it back into text.
+    # Binary records must bypass newline translation, so they use the raw
+    # stdout buffer when there is one.
+    log_binary = os.getenv("MIDI_LOG_MODE") == "binary"
+    binlog = BinaryLog()
+    if log_binary:
+        con_write = getattr(sys.stdout, 'buffer', sys.stdout).write
+    else:
+        con_write = sys.stdout.write
+
+    # Log messages get formatted straight into the console output buffer,
+    # which gets flushed to the serial console in one write on idle ticks
+    # (or when it fills up or gets old). That way, there are no intermediate
+    # str objects, and USB reads don't wait on the serial port for every
+    # message. The sb_midi_fmt functions write into the buffer in place.
+    con = ConsoleBuffer(con_write, size=1024, threshold=512, max_age_ms=50)
+    out = con.buf
+    fmt_event = fmt.event
+
+    # Nested function to format a complete SysEx message for logging. Only
+    # the first few bytes get hexdumped to keep long patch dumps readable.
+    # - sx: memoryview of the message from SysExAssembler.feed()
+    # - pos: position in out to start writing
+    # - returns: position in out after the end of the message
+    def sysex_msg(sx, pos):
+        out[pos:pos+4] = b'SX  '
+        pos = fmt.dec(out, pos + 4, sysex.length)
+        out[pos] = 0x20
+        pos = fmt.hexbytes(out, pos + 1, sx, 0, min(8, len(sx)))
+        if sysex.length > 8:
+            out[pos:pos+3] = b'...'
+            pos += 3
+        out[pos] = 0x0a
+        return pos + 1
+
+    # Nested functions for the CIN dispatch table. Each one takes a 4-byte
+    # usb midi packet, its route action bits, and a position in out. Then it
+    # writes a message to log and display into out at that position and
+    # returns the end position (returning pos means nothing to log).
+    def on_note_off(data, act, pos):
+        chan = (data[1] & 0x0f) + 1
+        if act & DISPLAY:
+            grid_off(chan, data[2])     # show in note grid
+        return fmt_event(out, pos, b'Off ', chan, data[2], data[3])
+
+    def on_note_on(data, act, pos):
+        chan = (data[1] & 0x0f) + 1
+        if act & DISPLAY:
+            grid_on(chan, data[2], data[3])     # show in note grid
+        return fmt_event(out, pos, b'On  ', chan, data[2], data[3])
+
+    def on_poly_pressure(data, act, pos):
+        # Polyphonic key pressure (aftertouch). These arrive here already
+        # coalesced, so there's at most one per key per flush interval.
+        return fmt_event(out, pos, b'PP  ', (data[1] & 0x0f) + 1, data[2],
+            data[3])
+
+    def on_cc(data, act, pos):
+        # Control Change. The controller decoder combines 14-bit MSB/LSB
+        # pairs and RPN/NRPN sequences into one event.
+        ctl = data[2]
+        if 120 <= ctl <= 127 and (act & DISPLAY):
+            # All Sound Off (120), All Notes Off (123), and the mode changes
+            # (124-127) end all notes on the channel
+            if ctl == 120 or ctl >= 123:
+                grid_all_off((data[1] & 0x0f) + 1)
+        k = cc_decode(data)
+        if k == PLAIN:
+            return fmt_event(out, pos, b'CC  ', (data[1] & 0x0f) + 1,
+                data[2], data[3])
+        if k == HELD:
+            return pos
+        return fmt_event(out, pos, CC_TAGS[k], (data[1] & 0x0f) + 1,
+            ctrl.param, ctrl.value)
+
+    def on_chan_pressure(data, act, pos):
+        # Channel key pressure (aftertouch), also coalesced per channel
+        return fmt_event(out, pos, b'CP  ', (data[1] & 0x0f) + 1, data[2])
+
+    def on_pitch_bend(data, act, pos):
+        # Pitch Bend as a signed 14-bit value (0 is centered)
+        return fmt_event(out, pos, b'PB  ', (data[1] & 0x0f) + 1,
+            pb_decode(data))
+
+    def on_sysex(data, act, pos):
+        # SysEx: collect packets until the message is done. CIN 0x5 is
+        # shared by 1-byte SysEx end packets and 1-byte System Common
+        # messages, so check for 0xf7 to tell them apart.
+        if (data[0] & 0x0f) == 0x05 and data[1] != 0xf7:
+            return on_other(data, act, pos)
+        sx = sysex_feed(data)
+        return pos if (sx is None) else sysex_msg(sx, pos)
+
+    def on_other(data, act, pos):
+        # Hexdump other messages: System Common or whatever
+        return fmt.hexdump(out, pos, data)
+
+    # Controller decoder state for 14-bit CC, RPN/NRPN, and pitch bend. The
+    # log tags for decoded CC events are indexed by cc_decode() result.
+    ctrl = ControllerDecoder()
+    cc_decode = ctrl.cc
+    pb_decode = ctrl.pitch_bend
+    CC_TAGS = (None, None, b'C14 ', b'RPN ', b'NRP ')
+
+    # CIN dispatch table. Use dispatch.set(cin, handler) to plug in other
+    # display or logging back-ends, even while the input loop is running.
+    dispatch = CINDispatch(on_other)
+    dispatch.set(0x04, on_sysex)
+    dispatch.set(0x05, on_sysex)
+    dispatch.set(0x06, on_sysex)
+    dispatch.set(0x07, on_sysex)
+    dispatch.set(0x08, on_note_off)
+    dispatch.set(0x09, on_note_on)
+    dispatch.set(0x0a, on_poly_pressure)
+    dispatch.set(0x0b, on_cc)
+    dispatch.set(0x0d, on_chan_pressure)
+    dispatch.set(0x0e, on_pitch_bend)
+
+    # Aftertouch and CC coalescing. Processing every key pressure message or
+    # every step of a knob sweep can destroy latency, so the input loop only
+    # remembers the latest value per key (poly pressure), per channel
+    # (channel pressure), or per controller (CC), then delivers pending
+    # values every aftertouch_ms or cc_ms milliseconds (see midi_filter.cfg).
+    # Flushes stop once FLUSH_BUDGET_MS has been spent on the current pass,
+    # and pick up again on the next one. With cc_passthrough = 1, every CC
+    # gets echoed at full resolution, but log and display get coalesced CCs.
+    # CC_BYPASS lists the CCs that are never coalesced because their order
+    # relative to other messages matters: 14-bit controller MSB/LSB pairs
+    # (0-63, including bank select and data entry) have to reach the
+    # controller decoder in order so an LSB never gets combined with a stale
+    # MSB, switch pedals (64-69) are on/off events, RPN/NRPN select and
+    # data increment/decrement (96-101) have to land before and after the
+    # data entry around them, and channel mode messages (120-127, like All
+    # Notes Off) have to stay in between the notes around them.
+    FLUSH_BUDGET_MS = const(4)
+    CC_BYPASS = (tuple(range(0, 70)) + tuple(range(96, 102))
+        + tuple(range(120, 128)))
+    coalesce = CoalescerGroup()
+    coalesce.add(Coalescer(0x0a, keys=128,
+        interval_ms=msg_filter.aftertouch_ms))
+    coalesce.add(Coalescer(0x0b, keys=128, interval_ms=msg_filter.cc_ms,
+        passthrough=msg_filter.cc_passthrough,
+        bypass=CC_BYPASS))
+    coalesce.add(Coalescer(0x0d, keys=1,
+        interval_ms=msg_filter.aftertouch_ms))
+
+    # Display refresh scheduler. Events only mark the display dirty, then
+    # the input loop refreshes at most DISPLAY_FPS frames per second, busy or
+    # idle. Put MIDI_DISPLAY_FPS = 0 in settings.toml to refresh only when
+    # the input loop is idle (with no cap).
+    DISPLAY_FPS = os.getenv("MIDI_DISPLAY_FPS", 30)
+    sched = RefreshScheduler(display.refresh, supervisor.ticks_ms,
+        DISPLAY_FPS, before=draw_grid)
+
+    # MIDI clock tracker for tempo and transport state (shown in the status
+    # label at most every CLOCK_MS milliseconds)
+    clock = ClockTracker(48)
+    CLOCK_MS = const(500)
 
     # Nested function to update status label text
     def set_status(msg, log_it=False):
@@ -100,44 +305,82 @@ def main():
     prev_b1 = button_1.value
     while True:
         set_status("USB Host\n scanning bus...", log_it=True)
-        event.text = ''
+        event.clear()
         display.refresh()
         gc.collect()
         device_cache = {}
+        ring = None     # gets set once the input loop starts
         try:
-            # This loop will end as soon as it finds a ScanResult object (r)
-            r = None
-            while r is None:
+            # This loop will end as soon as it finds at least one ScanResult
+            # object. Devices behind a hub may take a moment to enumerate, so
+            # do one more pass after that to pick up any stragglers.
+            found = []
+            while not found:
                 sleep(0.4)
-                r = find_usb_device(device_cache)
-            # Use ScanResult object to check if USB device descriptor info
-            # matches the class/subclass/protocol pattern for a MIDI device
-            dev = MIDIInputDevice(r)
-            set_status(
-                "USB Host\n MIDI Device\n vid:pid %04X:%04X\n" % (r.vid, r.pid)
-            )
+                found = find_usb_devices(device_cache)
+            sleep(0.4)
+            found += find_usb_devices(device_cache)
+            # Open all the MIDI devices so they can be polled together
+            dev = MIDIDeviceManager(found)
+            if len(found) == 1:
+                r = found[0]
+                dev_status = "USB Host\n MIDI Device\n vid:pid %04X:%04X\n" % (
+                    r.vid, r.pid)
+            else:
+                dev_status = "USB Host\n %d MIDI Devices\n%s" % (len(found),
+                    ''.join([" vid:pid %04X:%04X\n" % (r.vid, r.pid)
+                        for r in found[:3]]))
+            set_status(dev_status)
             # Collect garbage to hopefully limit heap fragmentation. If we're
             # lucky, this may help to avoid gc pauses during MIDI input loop.
             r = None
+            found = None
             device_cache = {}
             gc.collect()
             # Cache fn and obj references (MicroPython performance boost trick)
-            fast_wr = sys.stdout.write
-            refresh = display.refresh
+            con_start = con.start
+            con_commit = con.commit
+            con_tick = con.tick
+            bin_log = binlog.write
+            ticks_ms = supervisor.ticks_ms
+            sched.reset_stats()
+            mark_dirty = sched.mark
+            sched_tick = sched.tick
             port_out = None
             for p in usb_midi.ports:
                 if isinstance(p, usb_midi.PortOut):
                     port_out = p
                     break
+            # Echoed messages get converted to plain MIDI bytes and sent with
+            # one write per pass through the input loop
+            echo = MIDIEcho(port_out.write) if port_out else None
+            echo_add = echo.add if echo else None
+            echo_flush = echo.flush if echo else None
             # Poll for input until Button #1 pressed or USB error.
             # CAUTION: This loop needs to be as efficient as possible. Any
             # extra work here directly adds time to USB MIDI read latency.
-            # The pp_skip and cp_skip variables help with thinning out channel
-            # and polyphonic key pressure (aftertouch) messages.
-            SKIP = const(6)
-            pp_skip = SKIP
-            cp_skip = SKIP
-            for data in dev.input_event_generator():
+            coalesce.clear()
+            ctrl.reset()
+            clock.reset()
+            clock_rt = clock.realtime
+            clock_due = clock.due
+            held = coalesce.table
+            co_due = coalesce.due
+            co_pop = coalesce.pop_into
+            # The ring buffer lets the reader drain each bulk transfer right
+            # away, even when the dispatcher below is busy with slow stuff
+            # like display refreshes. Packets come out of the ring into the
+            # preallocated 4-byte data bytearray.
+            ring = PacketRing(256)
+            put_transfer = ring.put_transfer
+            get_into = ring.get_into
+            data = bytearray(4)
+            BUDGET = const(8)
+            routes = route_table.table
+            statuses = msg_filter.status
+            notes = msg_filter.notes
+            handlers = dispatch.table
+            for xfer in dev.input_batch_generator():
                 # Check for falling edge of button press (triggers usb re-scan)
                 if not button_1.value:
                     if prev_b1:
@@ -145,78 +388,114 @@ def main():
                         break
                 else:
                     prev_b1 = True
-                # Handle midi packet (should be None or 4-byte memoryview)
-                if data is None:
-                    continue
-
-                # Begin Parsing Packet
-                # NOTE: The & 0x0f below is a bitwise logical operation for
-                # masking off the CN (Cable Number) bits that indicate which
-                # midi port the message arrived from. Ignoring the cable number
-                # lets us filter more efficiently.
-                #     For example, on my BeatStep Pro, regular sequencer notes
-                # and CC happen on CN==0, while CN==1 has "MCU" (Mackie
-                # Control) messages. When set for "Control Mode" with the
-                # "MCU/HUI" knob sub-mode, the BSP sends relative knob turn
-                # amount events for use with DAW software. Ignoring CN lets us
-                # merge all the midi input streams to filter more efficiently.
-                cin = data[0] & 0x0f
-
-                # Filter out all System Real-Time messages. Sequencer playback
-                # commonly sends start/stop messages along with _many_ timing
-                # clocks. Dropping real-time messages conserves CPU to spend on
-                # handling note and cc messages.
-                if cin == 0x0f and (0xf8 <= data[1] <= 0xff):
-                    continue
-
-                # Handle notes, cc, aftertouch, pitchbend, etc.
-                chan = (data[1] & 0x0f) + 1
-                num = data[2]    # note or control number
-                if cin == 0x08:
-                    # Note off
-                    msg = 'Off %d %d %d\n' % (chan, num, data[3])
-                    visualize(chan, num, False)        # visualize in note grid
-                elif cin == 0x09:
-                    # Note on
-                    msg = 'On  %d %d %d\n' % (chan, num, data[3])
-                    visualize(chan, num, True)         # visualize in note grid
-                elif cin == 0x0a:
-                    # Polyphonic key pressure (aftertouch)
-                    if pp_skip > 0:
-                        # Ignore some of the polyphonic pressure messages
-                        # because processing them all can destroy our latency
-                        pp_skip -= 1
-                        continue
-                    pp_skip = SKIP
-                    msg = 'PP  %d %d %d\n' % (chan, num, data[3])
-                elif cin == 0x0b:
-                    # CC (control change)
-                    msg = 'CC  %d %d %d\n' % (chan, num, data[3])
-                elif cin == 0x0d:
-                    # Channel key pressure (aftertouch)
-                    if cp_skip > 0:
-                        # Ignore some of the channel pressure messages
-                        # because processing them all can destroy our latency
-                        cp_skip -= 1
-                        continue
-                    cp_skip = SKIP
-                    msg = 'CP  %d %d\n' % (chan, num)
-                elif cin == 0x0e:
-                    # Pitch bend
-                    msg = 'PB  %d %d %d\n' % (chan, num, data[3])
+                # Queue the transfer's packets (xfer is None or (buf, count)).
+                # While packets are arriving, dispatch as many packets per read
+                # as just got queued (at least BUDGET), so the ring can't fill
+                # up under sustained load, but the next read still happens
+                # soon. After an empty read, work through the whole backlog.
+                now = ticks_ms()
+                if xfer is None:
+                    budget = 0xffff
                 else:
-                    # Hexdump other messages: SysEx or whatever
-                    msg = '%02x %02x %02x %02x\n' % tuple(data)
-                # Echo message upstream to host computer (usb midi device)
-                if port_out:
-                    port_out.write(data)
-                # Send message to serial console
-                fast_wr(msg)
-                # Visualize non-note messages in text box
-                if cin != 0x08 and cin != 0x09:
-                    event.text = msg
-                # Draw the picodvi updates
-                refresh()
+                    put_transfer(xfer[0], xfer[1])
+                    budget = xfer[1] >> 2
+                    if budget < BUDGET:
+                        budget = BUDGET
+                # Packets come from the ring first. Once it's empty, deliver
+                # any coalesced values that are due.
+                flushing = co_due(now)
+                while budget > 0:
+                    if get_into(data):
+                        budget -= 1
+
+                        # Begin Parsing Packet
+                        # NOTE: Byte 0 holds the CN (Cable Number) bits that
+                        # indicate which midi port the message arrived from,
+                        # along with the CIN (Code Index Number). Indexing
+                        # the routing table with the whole byte gives
+                        # per-cable actions (display, log, echo, or drop) in
+                        # one lookup. Indexing the filter's status table
+                        # with byte 1 does the same for message type and
+                        # channel.
+                        act = routes[data[0]] & statuses[data[1]]
+                        if not act:
+                            continue
+                        # The & 0x0f below is a bitwise logical operation for
+                        # masking off the CN bits. After routing, the cables
+                        # get merged so the rest of the filtering is more
+                        # efficient.
+                        cin = data[0] & 0x0f
+
+                        # Filter note on/off and poly pressure by note range
+                        if 0x08 <= cin <= 0x0a and not notes[data[2]]:
+                            continue
+
+                        # Divert all System Real-Time messages to the clock
+                        # tracker. Sequencer playback commonly sends
+                        # start/stop messages along with _many_ timing
+                        # clocks. Only counting them (no logging or display)
+                        # conserves CPU to spend on handling note and cc
+                        # messages.
+                        if cin == 0x0f and data[1] >= 0xf8:
+                            clock_rt(data[1], now)
+                            continue
+
+                        # Hold aftertouch and CC values for coalescing
+                        co = held[cin]
+                        if co is not None and co.hold(data):
+                            if co.passthrough and echo and (act & ECHO):
+                                echo_add(data)
+                            continue
+                    elif flushing and co_pop(data):
+                        # Coalesced value (latest one for its slot)
+                        budget -= 1
+                        act = routes[data[0]]
+                        cin = data[0] & 0x0f
+                        if held[cin].passthrough:
+                            act &= ~ECHO    # already echoed on arrival
+                        # Stop flushing when the time budget is used up
+                        if ticks_diff(ticks_ms(), now) >= FLUSH_BUDGET_MS:
+                            budget = 0
+                    else:
+                        break
+
+                    # Echo message upstream to host computer (usb midi device)
+                    if echo and (act & ECHO):
+                        echo_add(data)
+
+                    # In binary log mode, log the raw packet and skip the text
+                    if log_binary and (act & LOG):
+                        start = con_start()
+                        con_commit(start, bin_log(out, start, data, now), now)
+                        act ^= LOG
+
+                    # Handle notes, cc, aftertouch, pitchbend, etc. with one
+                    # indexed lookup in the CIN dispatch table
+                    start = con_start()
+                    end = handlers[cin](data, act, start)
+                    if end == start:
+                        continue
+                    # Queue message for the serial console
+                    if act & LOG:
+                        con_commit(start, end, now)
+                    if act & DISPLAY:
+                        # Add non-note messages to the event history
+                        if cin != 0x08 and cin != 0x09:
+                            event_add(out, start, end)
+                        # Schedule a picodvi refresh (frame rate capped)
+                        mark_dirty()
+                # Send this pass's echo output upstream in one write
+                if echo:
+                    echo_flush()
+                # Send queued log output to the serial console if it's idle
+                # time, or if the output is piling up
+                con_tick(now, xfer is None)
+                # Show tempo and transport state at a low rate
+                if clock_due(now, CLOCK_MS):
+                    status.text = dev_status + clock.text()
+                    mark_dirty()
+                # Draw the picodvi updates if it's time for a frame
+                sched_tick(now, xfer is None)
         except USBError as e:
             # This sometimes happens when devices are unplugged. Not always.
             print("USBError: '%s' (device unplugged?)" % e)
@@ -225,6 +504,24 @@ def main():
             # This can happen if an initialization handshake glitches
             print(e)
             show_scan_msg = True
+        finally:
+            # Once the input loop has started, send any pending echo and log
+            # output (whether it ended with a button press or a USB error),
+            # then log read timeout and ring stats to help with tuning
+            if ring is not None:
+                if echo:
+                    echo_flush()
+                con.flush()
+                print(dev)
+                print(ring)
+                print(sysex)
+                print(coalesce)
+                print(clock)
+                if echo:
+                    print(echo)
+                print(sched)
+                print(grid)
+                print(con)
 
 
 main()
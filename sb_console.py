@@ -0,0 +1,86 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# Buffered serial console output.
+#
+# Writing each log message to sys.stdout right away means the main loop waits
+# on the USB CDC serial path once per MIDI event, which delays the next USB
+# MIDI read. Instead, messages get written into a preallocated bytearray and
+# flushed in one write when the input loop has an idle tick, when the buffer
+# passes a size threshold, or when the oldest message gets too old.
+#
+# To avoid copying, formatters write directly into `buf` starting at `pos`,
+# then the caller passes the new end position to commit(). The last
+# `reserve` bytes of buf are a scratch area where a message can be formatted
+# when the buffer is too full to take it (those count as dropped bytes).
+#
+from sb_ticks import ticks_diff
+
+
+class ConsoleBuffer:
+    def __init__(self, write, size=1024, threshold=512, max_age_ms=50,
+            reserve=64):
+        # Prepare a console output buffer
+        # - write: function for sending bytes (e.g. sys.stdout.write)
+        # - size: bytes of buffer space for pending messages
+        # - threshold: flush at the next tick once this many bytes are pending
+        # - max_age_ms: flush at the next tick once the oldest pending
+        #   message is this old
+        # - reserve: size of the scratch area (longest single message)
+        self.write = write
+        self.buf = bytearray(size + reserve)
+        self.view = memoryview(self.buf)
+        self.size = size
+        self.limit = size - reserve  # last position with room for a message
+        self.scratch = size          # start of scratch area
+        self.threshold = threshold
+        self.max_age_ms = max_age_ms
+        self.pos = 0            # end of pending data
+        self.since = 0          # ticks_ms() when pending data was started
+        self.flushes = 0        # number of writes to the console
+        self.flushed = 0        # bytes written to the console
+        self.dropped = 0        # bytes dropped because the buffer was full
+
+    def start(self):
+        # Get the position where the next message should be formatted
+        # - returns: self.pos if there's room, otherwise self.scratch
+        pos = self.pos
+        return pos if (pos <= self.limit) else self.scratch
+
+    def commit(self, start, end, now):
+        # Keep a message that was formatted at start (from self.start())
+        # - start: position where the message starts
+        # - end: position after the last byte of the message
+        # - now: current supervisor.ticks_ms() value
+        if start != self.pos:
+            # The message was formatted in the scratch area
+            self.dropped += end - start
+            return
+        if start == 0:
+            self.since = now
+        self.pos = end
+
+    def tick(self, now, idle):
+        # Flush pending output if it's time
+        # - now: current supervisor.ticks_ms() value
+        # - idle: True if the input loop had nothing to do this tick
+        pos = self.pos
+        if pos == 0:
+            return
+        if (idle or pos >= self.threshold
+                or ticks_diff(now, self.since) >= self.max_age_ms):
+            self.flush()
+
+    def flush(self):
+        # Write all pending output to the console
+        pos = self.pos
+        if pos == 0:
+            return
+        self.write(self.view[:pos])
+        self.pos = 0
+        self.flushes += 1
+        self.flushed += pos
+
+    def __str__(self):
+        return 'Console: %d flushes, %d bytes, %d bytes dropped' % (
+            self.flushes, self.flushed, self.dropped)
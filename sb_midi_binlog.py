@@ -0,0 +1,80 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# Compact binary record format for logging USB MIDI packets over serial.
+#
+# Text logging costs CPU time for formatting and about 12-16 bytes of serial
+# bandwidth per event. Binary records carry the raw 4-byte packet plus a
+# timestamp in 10 bytes, with no formatting at all:
+#
+#   offset  size  field
+#   0       2     sync marker: 0xA5 0x5A
+#   2       3     ticks_ms() modulo 2**24 (little-endian)
+#   5       4     raw usb midi packet
+#   9       1     check byte: XOR of bytes 2-8
+#
+# If bytes get lost or mixed with text output (like print() messages), a
+# decoder can recover by scanning for the sync marker and checking the check
+# byte. See tools/midi_log_decode.py for the host-side decoder.
+#
+# The timestamp is absolute (it wraps about every 4.6 hours) rather than a
+# delta from the previous record. That way, when a decoder has to skip a
+# corrupted record, the times of the records after it still come out right.
+# Only gaps of 4.6 hours or more between records get lost.
+#
+from micropython import const
+
+
+RECORD_LEN = const(10)
+SYNC0 = const(0xa5)
+SYNC1 = const(0x5a)
+TIME_MASK = const(0xffffff)    # timestamp field wraps at 2**24 ms
+
+
+class BinaryLog:
+    def __init__(self):
+        # Prepare a reusable buffer for one binary log record
+        self.buf = bytearray(RECORD_LEN)
+        self.view = memoryview(self.buf)
+        self.buf[0] = SYNC0
+        self.buf[1] = SYNC1
+        self.records = 0
+
+    def write(self, buf, pos, data, now):
+        # Write a binary log record
+        # - buf: bytearray to write into (needs RECORD_LEN bytes of room)
+        # - pos: index in buf to start writing
+        # - data: 4-byte usb midi packet
+        # - now: current supervisor.ticks_ms() value
+        # - returns: index in buf after the last byte written
+        # (ticks_ms() wraps at 2**29, a multiple of 2**24, so the low 24
+        # bits wrap smoothly too)
+        self.records += 1
+        b0 = now & 0xff
+        b1 = (now >> 8) & 0xff
+        b2 = (now >> 16) & 0xff
+        buf[pos] = SYNC0
+        buf[pos+1] = SYNC1
+        buf[pos+2] = b0
+        buf[pos+3] = b1
+        buf[pos+4] = b2
+        chk = b0 ^ b1 ^ b2
+        d = data[0]
+        buf[pos+5] = d
+        chk ^= d
+        d = data[1]
+        buf[pos+6] = d
+        chk ^= d
+        d = data[2]
+        buf[pos+7] = d
+        chk ^= d
+        d = data[3]
+        buf[pos+8] = d
+        buf[pos+9] = chk ^ d
+        return pos + RECORD_LEN
+
+    def record(self, data, now):
+        # Make a binary log record in this object's own buffer
+        # - returns: preallocated memoryview of the record
+        self.write(self.buf, 0, data, now)
+        return self.view
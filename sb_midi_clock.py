@@ -0,0 +1,145 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# MIDI clock and transport tracker.
+#
+# Sequencers send 24 timing clocks (0xF8) per quarter note along with Start
+# (0xFA), Continue (0xFB), and Stop (0xFC). Formatting or drawing something for
+# every clock would eat the CPU time needed for notes and CC, so ClockTracker
+# does only O(1) bookkeeping per tick: store the timestamp in a fixed-size
+# ring and bump a counter. The tempo estimate gets computed later, when the
+# display asks for it at a low rate.
+#
+from array import array
+
+from micropython import const
+
+from sb_ticks import ticks_diff
+
+
+PPQN = const(24)    # MIDI clocks per quarter note
+
+# Transport states
+STOPPED = const(0)
+PLAYING = const(1)
+
+_STATE_NAMES = ('Stop', 'Play')
+
+
+class ClockTracker:
+    def __init__(self, window=48):
+        # Prepare clock tracking state
+        # - window: number of clock intervals in the moving tempo window
+        #   (48 is two beats, which smooths out timestamps that get shared by
+        #   several clocks from the same USB transfer)
+        self.window = window
+        self.times = array('I', [0] * (window + 1))
+        self.i = 0              # next slot in times
+        self.filled = 0         # timestamps stored so far (up to window + 1)
+        self.ticks = 0          # clocks played since the last Start
+        self.total = 0          # clocks since the tracker was reset
+        self.state = STOPPED
+        self.starts = 0
+        self.stops = 0
+        self.continues = 0
+        self.sensing = 0        # active sensing (0xFE) messages
+        self.changed = False    # True when there's news for the display
+        self.shown = 0          # ticks_ms() of the last display update
+
+    def reset(self):
+        # Forget all clock and transport state
+        self.i = 0
+        self.filled = 0
+        self.ticks = 0
+        self.total = 0
+        self.state = STOPPED
+        self.changed = False
+
+    def realtime(self, status, now):
+        # Track a System Real-Time message
+        # - status: status byte in 0xf8..0xff
+        # - now: current supervisor.ticks_ms() value
+        if status == 0xf8:
+            # Timing clock (the common case, so keep it short)
+            i = self.i
+            self.times[i] = now
+            i += 1
+            self.i = 0 if (i > self.window) else i
+            if self.filled <= self.window:
+                self.filled += 1
+            # Song position only advances while playing (clocks can keep
+            # coming while stopped so the tempo stays locked)
+            if self.state == PLAYING:
+                self.ticks += 1
+            self.total += 1
+            self.changed = True
+        elif status == 0xfa:
+            # Start: play from the top
+            self.state = PLAYING
+            self.ticks = 0
+            self.starts += 1
+            self.changed = True
+        elif status == 0xfb:
+            # Continue: play from the current position
+            self.state = PLAYING
+            self.continues += 1
+            self.changed = True
+        elif status == 0xfc:
+            self.state = STOPPED
+            self.stops += 1
+            self.changed = True
+        elif status == 0xfe:
+            self.sensing += 1
+        elif status == 0xff:
+            # System Reset
+            self.reset()
+            self.changed = True
+
+    def due(self, now, interval_ms):
+        # Check whether the display should be updated
+        # - returns: True if something changed and at least interval_ms
+        #   have passed since the last update
+        if not self.changed:
+            return False
+        if ticks_diff(now, self.shown) < interval_ms:
+            return False
+        self.shown = now
+        self.changed = False
+        return True
+
+    def bpm10(self):
+        # Estimate tempo from the moving window of clock timestamps
+        # - returns: beats per minute times 10 (e.g. 1205 for 120.5 BPM), or
+        #   0 if there aren't enough clocks yet
+        n = self.filled - 1
+        if n < 1:
+            return 0
+        newest = self.i - 1
+        if newest < 0:
+            newest = self.window
+        oldest = self.i if (self.filled > self.window) else 0
+        dt = ticks_diff(self.times[newest], self.times[oldest])
+        if dt == 0:
+            return 0
+        # bpm = (n clocks / PPQN) beats / (dt / 60000) minutes
+        return (600000 * n + (PPQN * dt >> 1)) // (PPQN * dt)
+
+    def position(self):
+        # Get the song position since the last Start
+        # - returns: (bar, beat), both counting from 1, assuming 4/4 time
+        beats = self.ticks // PPQN
+        return ((beats >> 2) + 1, (beats & 3) + 1)
+
+    def text(self):
+        # Format a short status line for the display (allocates a str, so
+        # only call this at a low rate)
+        bpm = self.bpm10()
+        (bar, beat) = self.position()
+        return " %s %d.%d BPM %d:%d" % (_STATE_NAMES[self.state], bpm // 10,
+            bpm % 10, bar, beat)
+
+    def __str__(self):
+        bpm = self.bpm10()
+        return ('Clock: %d.%d BPM, %d clocks, %d starts, %d continues, '
+            '%d stops') % (bpm // 10, bpm % 10, self.total, self.starts,
+            self.continues, self.stops)
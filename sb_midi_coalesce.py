@@ -0,0 +1,197 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# Last-value-wins coalescing for continuous controller style MIDI messages.
+#
+# Aftertouch (and knob sweeps) can arrive much faster than the display and
+# serial log can keep up with. Rather than dropping a fixed fraction of the
+# messages, which tends to lose the final value, a Coalescer remembers only
+# the latest value for each (channel, key) slot and delivers the pending
+# slots at a limited rate. That way, the load stays bounded, but the last
+# value always gets through.
+#
+# State is kept in compact preallocated arrays:
+# - values: bytearray with one 7-bit value per slot
+# - dirty: bitmap with one bit per slot (set while a value is pending)
+# - queue: ring of pending slot numbers in arrival order (array('H') with
+#   head and tail indexes, like sb_midi_ring.PacketRing)
+# Holding a value is O(1), and a flush is O(number of pending slots) rather
+# than O(number of slots). For Control Change, that means a 16x128 value table
+# plus a 256 byte dirty bitmap, so a knob sweep collapses into one update per
+# controller per flush.
+#
+# Each slot is in the queue at most once (its dirty bit says so), so the ring
+# can't overflow, even when flushes only get partway through the queue before
+# the input loop's time budget runs out.
+#
+from array import array
+
+from sb_ticks import ticks_diff
+
+
+class Coalescer:
+    def __init__(self, cin, keys=1, interval_ms=20, passthrough=False,
+            bypass=()):
+        # Prepare coalescing state for one message type
+        # - cin: USB MIDI Code Index Number of the message type (e.g. 0x0a
+        #   for polyphonic key pressure)
+        # - keys: 1 for per-channel messages with the value in byte 2 (like
+        #   channel pressure), or 128 for per-key messages with the key in
+        #   byte 2 and the value in byte 3 (like poly pressure or CC)
+        # - interval_ms: minimum time between flushes
+        # - passthrough: True means the caller echoes every message as it
+        #   arrives (full resolution for downstream hosts) and only uses the
+        #   coalesced values for logging and display
+        # - bypass: keys (e.g. controller numbers) that should never be
+        #   coalesced because their order matters
+        slots = keys << 4
+        self.cin = cin
+        self.status = cin << 4      # MIDI status byte for channel 1
+        self.keys = keys
+        self.interval_ms = interval_ms
+        self.passthrough = passthrough
+        # Key bytes above 127 aren't valid MIDI. They always bypass so the
+        # slot math can't run past the end of the tables.
+        self.bypass = bytearray([0] * keys + [1] * (256 - keys))
+        for k in bypass:
+            self.bypass[k] = 1
+        self.values = bytearray(slots)
+        self.dirty = bytearray((slots + 7) >> 3)
+        self.queue = array('H', [0] * slots)
+        self.mask = slots - 1   # slots is a power of 2 (keys is 1 or 128)
+        # Head and tail run over twice the queue size so a full queue and an
+        # empty queue can be told apart
+        self.wrap = (slots << 1) - 1
+        self.cables = bytearray(slots)  # cable number per pending slot
+        self.head = 0           # next queued slot to deliver
+        self.tail = 0           # next free queue position
+        self.stop = 0           # where the flush in progress ends
+        self.flushing = False   # True while a flush is in progress
+        self.last = 0           # ticks_ms() of the last flush
+        self.held = 0           # messages held
+        self.sent = 0           # coalesced messages delivered
+
+    def __len__(self):
+        return (self.tail - self.head) & self.wrap
+
+    def hold(self, data):
+        # Remember the value from a 4-byte USB MIDI packet
+        # - returns: True if the value was held, False for a bypass key or
+        #   for a slot that already has a value pending from another cable
+        # Cables can be routed differently (see sb_midi_filter.RouteTable),
+        # so values from two cables never get merged into one slot. When
+        # two cables use the same channel and key at once, the newcomer
+        # skips coalescing and gets handled right away.
+        chan = data[1] & 0x0f
+        if self.keys == 1:
+            slot = chan
+            value = data[2]
+        else:
+            if self.bypass[data[2]]:
+                return False
+            slot = (chan << 7) | data[2]
+            value = data[3]
+        cable = data[0] >> 4
+        i = slot >> 3
+        m = 1 << (slot & 7)
+        dirty = self.dirty
+        if dirty[i] & m:
+            if self.cables[slot] != cable:
+                return False
+        else:
+            dirty[i] |= m
+            self.cables[slot] = cable
+            tail = self.tail
+            self.queue[tail & self.mask] = slot
+            self.tail = (tail + 1) & self.wrap
+        self.values[slot] = value
+        self.held += 1
+        return True
+
+    def due(self, now):
+        # Start a flush if values are pending and the interval has passed
+        # - now: current supervisor.ticks_ms() value
+        # - returns: True if a flush is in progress
+        # A flush delivers the values that were pending when it started.
+        # Values held after that wait for the next flush.
+        if self.flushing:
+            return True
+        if self.head == self.tail:
+            return False
+        if ticks_diff(now, self.last) < self.interval_ms:
+            return False
+        self.last = now
+        self.stop = self.tail
+        self.flushing = True
+        return True
+
+    def pop_into(self, data):
+        # Write the next pending value into a 4-byte packet bytearray
+        # - returns: True if data was filled, False if the flush is done
+        i = self.head
+        if i == self.stop:
+            self.flushing = False
+            return False
+        self.head = (i + 1) & self.wrap
+        slot = self.queue[i & self.mask]
+        self.dirty[slot >> 3] &= ~(1 << (slot & 7))
+        if self.keys == 1:
+            chan = slot
+            data[2] = self.values[slot]
+            data[3] = 0
+        else:
+            chan = slot >> 7
+            data[2] = slot & 0x7f
+            data[3] = self.values[slot]
+        data[0] = (self.cables[slot] << 4) | self.cin
+        data[1] = self.status | chan
+        self.sent += 1
+        return True
+
+    def clear(self):
+        # Discard all pending values
+        self.dirty[:] = bytes(len(self.dirty))
+        self.head = 0
+        self.tail = 0
+        self.stop = 0
+        self.flushing = False
+
+
+class CoalescerGroup:
+    def __init__(self):
+        # Prepare an empty group. The table attribute maps CIN to the
+        # Coalescer for that message type (or None), so the input loop can
+        # check whether to hold a packet with one indexed lookup.
+        self.table = [None] * 16
+        self.members = []
+
+    def add(self, coalescer):
+        # Add a Coalescer to the group
+        self.table[coalescer.cin] = coalescer
+        self.members.append(coalescer)
+        return coalescer
+
+    def due(self, now):
+        # Start flushes for members whose interval has passed
+        # - returns: True if any member has a flush in progress
+        flushing = False
+        for c in self.members:
+            if c.due(now):
+                flushing = True
+        return flushing
+
+    def pop_into(self, data):
+        # Write the next value from any member that is flushing into data
+        # - returns: True if data was filled, False if all flushes are done
+        for c in self.members:
+            if c.flushing and c.pop_into(data):
+                return True
+        return False
+
+    def clear(self):
+        for c in self.members:
+            c.clear()
+
+    def __str__(self):
+        return 'Coalesce: ' + ', '.join(['CIN %X %d held, %d sent' % (
+            c.cin, c.held, c.sent) for c in self.members])
@@ -0,0 +1,134 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# Decoder for multi-message controller values.
+#
+# Some controller values span several Control Change messages:
+# - 14-bit controllers: CC 0-31 carry the MSB, and CC 32-63 carry the LSB for
+#   the matching controller (e.g. CC 1 + CC 33 for a hi-res mod wheel)
+# - RPN/NRPN: CC 101/100 (RPN) or CC 99/98 (NRPN) select a parameter number,
+#   then CC 6/38 (data entry MSB/LSB) or CC 96/97 (increment/decrement) set
+#   its 14-bit value
+# Logging the raw CCs makes these hard to read, so ControllerDecoder tracks
+# the per-channel state and reports one meaningful event instead.
+#
+# Once a controller has sent an LSB, all of its messages get reported as
+# 14-bit values. An MSB on its own resets the LSB to 0 (that's what the MIDI
+# spec says it means), so it gets reported as MSB<<7, and an LSB that follows
+# fills in the low bits. Controllers that only send MSBs get reported as plain
+# CCs. Data entry MSBs and LSBs always get reported as parameter values.
+#
+# All state lives in fixed preallocated arrays, so decoding doesn't allocate.
+#
+from array import array
+
+from micropython import const
+
+
+# Return codes for ControllerDecoder.cc()
+PLAIN = const(0)    # ordinary 7-bit CC, log it as is
+HELD  = const(1)    # state was updated, nothing to log yet
+CC14  = const(2)    # 14-bit controller: param=controller (0-31), value
+RPN   = const(3)    # registered parameter: param, value (both 14-bit)
+NRPN  = const(4)    # non-registered parameter: param, value (both 14-bit)
+
+
+class ControllerDecoder:
+    def __init__(self):
+        # Prepare per-channel decoder state
+        self.msb = bytearray(16 * 32)       # last MSB for CC 0-31
+        self.hires = bytearray(16 * 32 // 8)  # bitmap: LSB seen for CC 0-31
+        self.kind = bytearray(16)           # RPN, NRPN, or 0 (none selected)
+        self.pnum_msb = bytearray([127] * 16)  # parameter number MSB
+        self.pnum_lsb = bytearray([127] * 16)  # parameter number LSB
+        self.data = array('H', [0] * 16)    # parameter value (data entry)
+        self.bend = array('h', [0] * 16)    # signed pitch bend per channel
+        self.param = 0      # parameter or controller number of last event
+        self.value = 0      # 14-bit value of last event
+
+    def reset(self):
+        # Forget all controller state
+        self.msb[:] = bytes(len(self.msb))
+        self.hires[:] = bytes(len(self.hires))
+        self.kind[:] = bytes(16)
+        self.pnum_msb[:] = bytes([127] * 16)
+        self.pnum_lsb[:] = bytes([127] * 16)
+        for i in range(16):
+            self.data[i] = 0
+            self.bend[i] = 0
+
+    def cc(self, data):
+        # Decode a Control Change packet
+        # - data: 4-byte usb midi packet
+        # - returns: PLAIN, HELD, CC14, RPN, or NRPN. For CC14, RPN, and
+        #   NRPN, the param and value attributes hold the decoded event.
+        chan = data[1] & 0x0f
+        ctl = data[2]
+        v = data[3]
+        kind = self.kind[chan]
+        if ctl >= 96:
+            if ctl <= 97:
+                # Data increment (96) or decrement (97)
+                if not kind:
+                    return PLAIN
+                x = self.data[chan]
+                if ctl == 96:
+                    if x < 0x3fff:
+                        x += 1
+                elif x > 0:
+                    x -= 1
+                self.data[chan] = x
+                return self._event(chan, kind, x)
+            if ctl <= 101:
+                # Parameter number select: 99/98 NRPN, 101/100 RPN MSB/LSB
+                kind = NRPN if (ctl <= 99) else RPN
+                if ctl & 1:
+                    self.pnum_msb[chan] = v
+                else:
+                    self.pnum_lsb[chan] = v
+                if self.pnum_msb[chan] == 127 and self.pnum_lsb[chan] == 127:
+                    kind = 0    # null parameter number (deselect)
+                self.kind[chan] = kind
+                return HELD
+            return PLAIN
+        if kind and (ctl == 6 or ctl == 38):
+            # Data entry MSB (6, resets the LSB) or LSB (38) for the selected
+            # parameter
+            if ctl == 6:
+                x = v << 7
+            else:
+                x = (self.data[chan] & 0x3f80) | v
+            self.data[chan] = x
+            return self._event(chan, kind, x)
+        if ctl < 32:
+            # MSB: report it with the LSB reset to 0 if this controller also
+            # sends LSBs
+            slot = (chan << 5) | ctl
+            self.msb[slot] = v
+            if self.hires[slot >> 3] & (1 << (slot & 7)):
+                self.param = ctl
+                self.value = v << 7
+                return CC14
+            return PLAIN
+        if ctl < 64:
+            # LSB: combine with the most recent MSB
+            slot = (chan << 5) | (ctl - 32)
+            self.hires[slot >> 3] |= 1 << (slot & 7)
+            self.param = ctl - 32
+            self.value = (self.msb[slot] << 7) | v
+            return CC14
+        return PLAIN
+
+    def _event(self, chan, kind, x):
+        # Report a parameter value change for the selected RPN or NRPN
+        self.param = (self.pnum_msb[chan] << 7) | self.pnum_lsb[chan]
+        self.value = x
+        return kind
+
+    def pitch_bend(self, data):
+        # Decode a Pitch Bend packet
+        # - data: 4-byte usb midi packet (LSB in byte 2, MSB in byte 3)
+        # - returns: signed bend amount in -8192..8191 (0 is centered)
+        v = ((data[3] << 7) | data[2]) - 8192
+        self.bend[data[1] & 0x0f] = v
+        return v
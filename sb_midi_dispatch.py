@@ -0,0 +1,38 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# Table-driven dispatch for USB MIDI packets.
+#
+# The low nibble of USB MIDI packet byte 0 is the Code Index Number (CIN),
+# which says what kind of message the packet carries. Indexing a 16-entry
+# list of handlers with the CIN costs the same for every message type, while
+# an if/elif chain makes later branches pay for all the earlier comparisons.
+#
+# Handlers take (data, act, pos) where data is a 4-byte usb midi packet, act
+# is the route action bits from sb_midi_filter, and pos is where to start
+# writing in a shared output buffer (see sb_midi_fmt and sb_console). They
+# write their log message there and return the end position, or return pos
+# if there's nothing more to do.
+#
+
+
+class CINDispatch:
+    def __init__(self, default):
+        # Make a dispatch table with the same handler for every CIN
+        # - default: handler for CINs that don't get their own handler
+        # The table attribute is a list of 16 handlers indexed by CIN. Hot
+        # loops should cache it in a local and index it directly. Since set()
+        # changes the list in place, swapping handlers at runtime takes
+        # effect right away, even for loops that cached the list.
+        self.default = default
+        self.table = [default] * 16
+
+    def set(self, cin, handler=None):
+        # Swap in a handler for a CIN
+        # - cin: Code Index Number in 0-15
+        # - handler: function(data, act, pos), or None to restore the default
+        self.table[cin & 0x0f] = self.default if (handler is None) else handler
+
+    def get(self, cin):
+        # Get the current handler for a CIN
+        return self.table[cin & 0x0f]
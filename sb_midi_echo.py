@@ -0,0 +1,65 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# Batched MIDI echo to the upstream usb_midi port.
+#
+# usb_midi.PortOut.write() takes plain MIDI bytes, not 4-byte USB MIDI event
+# packets. Each packet's CIN (Code Index Number) says how many of its 3 MIDI
+# bytes are real (a lookup table handles that), and the cable/CIN header byte
+# never gets sent. Converted bytes collect in a preallocated buffer so a whole
+# bulk transfer's worth of messages goes out in one write.
+#
+# CAUTION: Since the cables get merged, this works best for devices that
+# only use cable 0, or when routes only echo one cable.
+#
+
+# Number of MIDI bytes in a USB MIDI packet, indexed by CIN. CIN 0x0 and 0x1
+# are reserved for future extensions (skip them). CIN 0x5 is SysEx end or a
+# 1-byte System Common message, 0x6 and 0x7 are SysEx ends, and 0xf is a
+# single byte (usually real-time).
+CIN_LEN = bytes((0, 0, 2, 3, 3, 1, 2, 3, 3, 3, 3, 3, 2, 2, 3, 1))
+
+
+class MIDIEcho:
+    def __init__(self, write, size=192):
+        # Prepare an echo output buffer
+        # - write: function for sending MIDI bytes (e.g. PortOut.write)
+        # - size: buffer size in bytes (a full 64-byte transfer is at most
+        #   48 MIDI bytes)
+        self.write = write
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.limit = size - 3   # last position with room for a packet
+        self.pos = 0
+        self.writes = 0         # number of write calls
+        self.sent = 0           # MIDI bytes sent
+
+    def add(self, data):
+        # Convert a 4-byte USB MIDI packet and queue its MIDI bytes
+        n = CIN_LEN[data[0] & 0x0f]
+        if n == 0:
+            return
+        pos = self.pos
+        if pos > self.limit:
+            self.flush()
+            pos = 0
+        buf = self.buf
+        buf[pos] = data[1]
+        if n > 1:
+            buf[pos+1] = data[2]
+            if n > 2:
+                buf[pos+2] = data[3]
+        self.pos = pos + n
+
+    def flush(self):
+        # Send all queued MIDI bytes with one write
+        pos = self.pos
+        if pos == 0:
+            return
+        self.write(self.view[:pos])
+        self.pos = 0
+        self.writes += 1
+        self.sent += pos
+
+    def __str__(self):
+        return 'Echo: %d writes, %d bytes' % (self.writes, self.sent)
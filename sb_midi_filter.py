@@ -0,0 +1,206 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# Routing and filtering tables for USB MIDI packets.
+#
+# The first byte of a USB MIDI packet packs the cable number (high nibble)
+# together with the Code Index Number (low nibble). Indexing a 256-byte table
+# with that byte gives per-cable, per-CIN routing in one lookup, which is
+# about as cheap as the `& 0x0f` it replaces.
+#
+# MessageFilter does the same thing for the MIDI status byte (packet byte 1),
+# which covers message type and channel in one lookup, plus a 256-byte table
+# for note ranges (indexed by packet byte 2). The filter spec gets loaded from
+# a settings file on CIRCUITPY at startup (see midi_filter.cfg), then compiled
+# into the tables, so the per-packet check stays a couple of indexed loads.
+#
+from micropython import const
+
+
+# Action bits for RouteTable entries (0 means drop the packet)
+DISPLAY = const(1)   # show on the picodvi display (note grid or text box)
+LOG     = const(2)   # write to the serial console
+ECHO    = const(4)   # echo upstream to the usb_midi port
+ALL     = const(7)
+
+
+class RouteTable:
+    def __init__(self, actions=ALL):
+        # Make a routing table with the same actions for every packet
+        # - actions: bitwise OR of DISPLAY, LOG, and ECHO (or 0 for drop)
+        # The table attribute is a 256-byte bytearray indexed by packet byte
+        # 0. Hot loops should cache it in a local and index it directly.
+        self.table = bytearray([actions] * 256)
+
+    def set(self, cable=None, cin=None, actions=ALL):
+        # Set the actions for a cable, a CIN, or both
+        # - cable: cable number in 0-15, or None for all cables
+        # - cin: Code Index Number in 0-15, or None for all CINs
+        # - actions: bitwise OR of DISPLAY, LOG, and ECHO (or 0 for drop)
+        cables = range(16) if (cable is None) else (cable,)
+        cins = range(16) if (cin is None) else (cin,)
+        t = self.table
+        for cn in cables:
+            for c in cins:
+                t[(cn << 4) | c] = actions
+
+    def actions(self, cable, cin):
+        # Get the action bits for a cable and CIN
+        return self.table[((cable & 0x0f) << 4) | (cin & 0x0f)]
+
+
+# Message type names for the filter spec's `types` key, with the ranges of
+# status bytes they cover as (first, last) pairs
+_TYPES = {
+    'note':      ((0x80, 0x9f),),
+    'poly':      ((0xa0, 0xaf),),
+    'cc':        ((0xb0, 0xbf),),
+    'program':   ((0xc0, 0xcf),),
+    'pressure':  ((0xd0, 0xdf),),
+    'bend':      ((0xe0, 0xef),),
+    # SysEx continuation packets can start with data bytes (0x00-0x7f)
+    'sysex':     ((0x00, 0x7f), (0xf0, 0xf0), (0xf7, 0xf7)),
+    'common':    ((0xf1, 0xf6),),
+    'clock':     ((0xf8, 0xf9),),
+    'transport': ((0xfa, 0xfd),),
+    'sensing':   ((0xfe, 0xfe),),
+    'reset':     ((0xff, 0xff),),
+}
+
+
+def _ranges(value, lo, hi):
+    # Parse a list of numbers and ranges like '1-4 10' into (first, last)
+    # pairs, checking that they're all in lo..hi
+    result = []
+    for item in value.replace(',', ' ').split():
+        (a, _, b) = item.partition('-')
+        a = int(a)
+        b = int(b) if b else a
+        if not (lo <= a <= b <= hi):
+            raise ValueError('%s out of range %d-%d' % (item, lo, hi))
+        result.append((a, b))
+    return result
+
+
+class MessageFilter:
+    def __init__(self):
+        # Make a filter that passes everything, with default thinning rates.
+        # The status attribute is a 256-byte bytearray of action bits indexed
+        # by packet byte 1 (MIDI status), and notes is a 256-byte bytearray
+        # indexed by packet byte 2 (note number, 1 to pass, 0 to drop). Note
+        # bytes above 127 aren't valid MIDI, so the upper half stays 0 and
+        # they get dropped. Hot loops should cache them in locals and index
+        # them directly.
+        self.status = bytearray([ALL] * 256)
+        self.types = bytearray([1] * 256)   # pass flags by status byte
+        self.chans = bytearray([1] * 16)    # pass flags by channel
+        self.notes = bytearray([1] * 128 + [0] * 128)
+        self.cables = bytearray([1] * 16)   # 1 to pass, 0 to drop
+        self.aftertouch_ms = 20     # coalescing interval for aftertouch
+        self.cc_ms = 16             # coalescing interval for CC
+        self.cc_passthrough = False  # echo every CC at full resolution
+
+    def load(self, path):
+        # Load and compile a filter spec file
+        # - path: file path like '/midi_filter.cfg'
+        # - returns: True if the file was loaded, False if it's missing
+        # Lines that don't parse get reported and skipped so a typo can't
+        # stop the tester from starting up.
+        try:
+            with open(path, 'r') as f:
+                lines = f.read().split('\n')
+        except OSError:
+            return False
+        spec = {}
+        for (n, line) in enumerate(lines):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            (k, sep, v) = line.partition('=')
+            k = k.strip()
+            if not sep or not (k in _KEYS):
+                print('%s:%d: unknown setting: %s' % (path, n + 1, line))
+                continue
+            spec[k] = (n + 1, v.strip())
+        for k in _KEYS:
+            if k in spec:
+                (n, v) = spec[k]
+                try:
+                    getattr(self, '_set_' + k)(v)
+                except ValueError as e:
+                    print('%s:%d: %s: %s' % (path, n, k, e))
+        return True
+
+    def _set_types(self, value):
+        # Pass only the listed message types
+        names = value.replace(',', ' ').split()
+        for name in names:
+            if not (name in _TYPES):
+                raise ValueError('unknown type ' + name)
+        types = self.types
+        types[:] = bytes(256)
+        for name in names:
+            for (a, b) in _TYPES[name]:
+                for i in range(a, b + 1):
+                    types[i] = 1
+        self._compile()
+
+    def _set_channels(self, value):
+        # Pass only the listed channels (1-16) for channel messages
+        ranges = _ranges(value, 1, 16)
+        chans = self.chans
+        chans[:] = bytes(16)
+        for (a, b) in ranges:
+            for c in range(a, b + 1):
+                chans[c - 1] = 1
+        self._compile()
+
+    def _set_notes(self, value):
+        # Pass only notes in the listed ranges (0-127) for note on, note off,
+        # and polyphonic key pressure
+        ranges = _ranges(value, 0, 127)
+        notes = self.notes
+        notes[:] = bytes(256)
+        for (a, b) in ranges:
+            for i in range(a, b + 1):
+                notes[i] = 1
+
+    def _set_cables(self, value):
+        # Pass only the listed cable numbers (0-15)
+        ranges = _ranges(value, 0, 15)
+        cables = self.cables
+        cables[:] = bytes(16)
+        for (a, b) in ranges:
+            for i in range(a, b + 1):
+                cables[i] = 1
+
+    def _set_aftertouch_ms(self, value):
+        self.aftertouch_ms = int(value)
+
+    def _set_cc_ms(self, value):
+        self.cc_ms = int(value)
+
+    def _set_cc_passthrough(self, value):
+        self.cc_passthrough = int(value) != 0
+
+    def _compile(self):
+        # Rebuild the status table from the message type and channel flags
+        t = self.status
+        types = self.types
+        chans = self.chans
+        for i in range(256):
+            ok = types[i]
+            if 0x80 <= i <= 0xef:
+                ok = ok and chans[i & 0x0f]
+            t[i] = ALL if ok else 0
+
+    def apply(self, route_table):
+        # Drop packets from filtered cables in a RouteTable
+        for cn in range(16):
+            if not self.cables[cn]:
+                route_table.set(cable=cn, actions=0)
+
+
+# Setting names for filter spec files, in the order they get applied
+_KEYS = ('types', 'channels', 'notes', 'cables', 'aftertouch_ms', 'cc_ms',
+    'cc_passthrough')
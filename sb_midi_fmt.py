@@ -0,0 +1,114 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# Allocation-free text formatting for MIDI event log messages.
+#
+# Formatting messages with `'On  %d %d %d\n' % (...)` costs a tuple, a new
+# string, and a format string parse for every event. During dense playing,
+# that's the biggest source of garbage collection pressure. Instead, the
+# functions here write ASCII bytes straight into a caller-provided bytearray
+# using precomputed digit tables, then return the new write position.
+#
+# Message formats match the old % formatting, for example:
+#   On  1 60 100
+#   CP  1 64
+#   90 3c 64 00   (hexdump)
+#
+
+
+def _digit_table():
+    # Build a table with 4 bytes per value for 0-127: the length, then up
+    # to 3 ASCII digits. Channels 1-16 come from the same table.
+    t = bytearray(128 * 4)
+    for v in range(128):
+        s = str(v)
+        t[v * 4] = len(s)
+        for (i, c) in enumerate(s):
+            t[v * 4 + 1 + i] = ord(c)
+    return t
+
+_DEC = _digit_table()
+_HEX = b'0123456789abcdef'
+
+
+def dec(buf, pos, v):
+    # Write a decimal number
+    # - buf: bytearray to write into
+    # - pos: index in buf to start writing
+    # - v: integer (0-127 is fastest, but any value works)
+    # - returns: index in buf after the last byte written
+    if 0 <= v <= 127:
+        k = v << 2
+        n = _DEC[k]
+        buf[pos] = _DEC[k+1]
+        if n > 1:
+            buf[pos+1] = _DEC[k+2]
+            if n > 2:
+                buf[pos+2] = _DEC[k+3]
+        return pos + n
+    if v < 0:
+        buf[pos] = 0x2d  # '-'
+        pos += 1
+        v = -v
+    # Slow path for bigger numbers: count digits, then fill backwards
+    end = pos
+    t = v
+    while True:
+        end += 1
+        t //= 10
+        if t == 0:
+            break
+    i = end
+    while i > pos:
+        i -= 1
+        buf[i] = 0x30 + (v % 10)
+        v //= 10
+    return end
+
+def event(buf, pos, tag, chan, a, b=-1):
+    # Write a channel message like 'On  1 60 100\n' or 'CP  1 64\n'
+    # - buf: bytearray to write into
+    # - pos: index in buf to start writing
+    # - tag: 4-byte message tag like b'On  ' or b'CC  '
+    # - chan: channel number in 1-16
+    # - a: first data value (note, controller, pressure, etc.)
+    # - b: second data value, or -1 to leave it out
+    # - returns: index in buf after the last byte written
+    buf[pos] = tag[0]
+    buf[pos+1] = tag[1]
+    buf[pos+2] = tag[2]
+    buf[pos+3] = tag[3]
+    pos = dec(buf, pos + 4, chan)
+    buf[pos] = 0x20
+    pos = dec(buf, pos + 1, a)
+    if b >= 0:
+        buf[pos] = 0x20
+        pos = dec(buf, pos + 1, b)
+    buf[pos] = 0x0a
+    return pos + 1
+
+def hexbytes(buf, pos, data, start, end):
+    # Write space separated hex bytes (no newline)
+    # - buf: bytearray to write into
+    # - pos: index in buf to start writing
+    # - data: bytes, bytearray, or memoryview with bytes to hexdump
+    # - start, end: range of indexes in data to hexdump
+    # - returns: index in buf after the last byte written
+    i = start
+    while i < end:
+        if i > start:
+            buf[pos] = 0x20
+            pos += 1
+        b = data[i]
+        buf[pos] = _HEX[b >> 4]
+        buf[pos+1] = _HEX[b & 0x0f]
+        pos += 2
+        i += 1
+    return pos
+
+def hexdump(buf, pos, data):
+    # Write a 4-byte usb midi packet as hex like '90 3c 64 00\n'
+    # - returns: index in buf after the last byte written
+    pos = hexbytes(buf, pos, data, 0, 4)
+    buf[pos] = 0x0a
+    return pos + 1
@@ -0,0 +1,113 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# Ring buffer for USB MIDI packets.
+#
+# This sits between the USB reader and the event dispatcher so the reader can
+# drain a whole bulk transfer right away, while slow stages (display refresh,
+# serial logging) catch up at their own pace.
+#
+# Packets get stored as-is in a bytearray with one 4-byte slot per packet.
+# Packing them into 32-bit words would be one store instead of four, but
+# words for cables 4-15 would be 2**30 or more, which MicroPython can only
+# handle as heap allocated big ints.
+#
+# The ring is lock-free for one producer and one consumer: put methods only
+# write `head`, get methods only write `tail`.
+#
+
+
+class PacketRing:
+    def __init__(self, capacity=256):
+        # Allocate a ring buffer for USB MIDI packets
+        # - capacity: number of packet slots (rounded up to a power of 2)
+        size = 4
+        while size < capacity:
+            size <<= 1
+        self.buf = bytearray(size << 2)
+        self.size = size
+        self.mask = size - 1
+        # Head and tail run over twice the size so a full ring and an empty
+        # ring can be told apart without wasting a slot
+        self.wrap = (size << 1) - 1
+        self.head = 0          # next slot to write (producer)
+        self.tail = 0          # next slot to read (consumer)
+        self.overflows = 0     # packets dropped because the ring was full
+        self.high_water = 0    # most packets ever waiting at once
+
+    def __len__(self):
+        return (self.head - self.tail) & self.wrap
+
+    def put(self, packet):
+        # Add a packet to the ring
+        # - packet: 4-byte usb midi packet
+        # - returns: True for success, False if the ring was full
+        head = self.head
+        used = ((head - self.tail) & self.wrap) + 1
+        if used > self.size:
+            self.overflows += 1
+            return False
+        buf = self.buf
+        j = (head & self.mask) << 2
+        buf[j] = packet[0]
+        buf[j+1] = packet[1]
+        buf[j+2] = packet[2]
+        buf[j+3] = packet[3]
+        self.head = (head + 1) & self.wrap
+        if used > self.high_water:
+            self.high_water = used
+        return True
+
+    def put_transfer(self, data, n):
+        # Add all the 4-byte packets from a bulk transfer
+        # - data: bytearray (or memoryview) from a USB bulk read
+        # - n: number of bytes in data that were filled by the read
+        # - returns: number of packets added (others count as overflows)
+        buf = self.buf
+        mask = self.mask
+        wrap = self.wrap
+        head = self.head
+        free = self.size - ((head - self.tail) & wrap)
+        count = n >> 2
+        if count > free:
+            self.overflows += count - free
+            count = free
+        i = 0
+        end = count << 2
+        while i < end:
+            j = (head & mask) << 2
+            buf[j] = data[i]
+            buf[j+1] = data[i+1]
+            buf[j+2] = data[i+2]
+            buf[j+3] = data[i+3]
+            head += 1
+            i += 4
+        self.head = head & wrap
+        used = (head - self.tail) & wrap
+        if used > self.high_water:
+            self.high_water = used
+        return count
+
+    def get_into(self, packet):
+        # Remove the oldest packet from the ring
+        # - packet: 4-byte bytearray to hold the usb midi packet
+        # - returns: True for success, False if the ring is empty
+        tail = self.tail
+        if tail == self.head:
+            return False
+        buf = self.buf
+        j = (tail & self.mask) << 2
+        packet[0] = buf[j]
+        packet[1] = buf[j+1]
+        packet[2] = buf[j+2]
+        packet[3] = buf[j+3]
+        self.tail = (tail + 1) & self.wrap
+        return True
+
+    def clear(self):
+        # Discard waiting packets (counters are left alone)
+        self.tail = self.head
+
+    def __str__(self):
+        return 'Ring: %d/%d packets, high water: %d, overflows: %d' % (
+            len(self), self.size, self.high_water, self.overflows)
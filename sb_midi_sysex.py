@@ -0,0 +1,113 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# SysEx reassembly for USB MIDI packets.
+#
+# USB MIDI splits System Exclusive messages into 4-byte packets with Code
+# Index Numbers 0x4 (start or continue, 3 bytes), 0x5 (end, 1 byte), 0x6
+# (end, 2 bytes), and 0x7 (end, 3 bytes). This collects the payload bytes
+# into a preallocated buffer so each complete message gets handled once,
+# rather than formatting and logging every packet of a patch dump.
+#
+from micropython import const
+
+
+# Number of MIDI bytes carried by each SysEx CIN (indexed by CIN - 4)
+_SYSEX_LEN = b'\x03\x01\x02\x03'
+
+_SOX = const(0xf0)  # Start of SysEx
+_EOX = const(0xf7)  # End of SysEx
+
+
+class SysExAssembler:
+    def __init__(self, size=256, stream=None):
+        # Prepare a bounded buffer for reassembling SysEx messages
+        # - size: buffer size in bytes (longest message kept in one piece)
+        # - stream: optional callback, stream(chunk, final), for messages
+        #   longer than the buffer. Each time the buffer fills, it gets
+        #   passed to stream() as a memoryview with final=False, then the
+        #   last partial chunk is passed with final=True. Without a stream
+        #   callback, bytes past the end of the buffer are dropped.
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.size = size
+        self.stream = stream
+        self.n = 0              # bytes currently in buf
+        self.length = 0         # total length of current (or last) message
+        self.active = False     # True between F0 and F7
+        self.streamed = False   # current message was passed to stream()
+        self.overflowed = False # current message lost bytes to overflow
+        self.messages = 0       # complete messages
+        self.truncated = 0      # messages cut short by a new F0
+        self.overflows = 0      # messages that didn't fit in the buffer
+        self.dropped = 0        # bytes discarded (overflow or no F0)
+
+    def reset(self):
+        # Abandon any partial message (counters are left alone)
+        self.active = False
+        self.n = 0
+
+    def feed(self, data):
+        # Add the payload of a SysEx usb midi packet (CIN 0x4 to 0x7)
+        # - data: 4-byte usb midi packet
+        # - returns: memoryview of a complete message (F0 ... F7), or None
+        #   if the message isn't finished yet or was passed to stream().
+        #   CAUTION: The memoryview points into the reassembly buffer, so
+        #   it's only valid until the next call to feed().
+        cin = data[0] & 0x0f
+        if not (0x04 <= cin <= 0x07):
+            return None
+        end = _SYSEX_LEN[cin - 4] + 1
+        buf = self.buf
+        size = self.size
+        msg = None
+        i = 1
+        while i < end:
+            b = data[i]
+            i += 1
+            if b == _SOX:
+                if self.active:
+                    self.truncated += 1
+                self.active = True
+                self.streamed = False
+                self.overflowed = False
+                self.n = 0
+                self.length = 0
+            elif not self.active:
+                # Payload without a start byte (joined mid-message?)
+                self.dropped += 1
+                continue
+            self.length += 1
+            n = self.n
+            if n == size:
+                if self.stream is not None:
+                    # Hand off the full buffer, then start refilling it
+                    self.stream(self.view, False)
+                    self.streamed = True
+                    n = 0
+                else:
+                    if not self.overflowed:
+                        self.overflowed = True
+                        self.overflows += 1
+                    self.dropped += 1
+                    n = -1
+            if n >= 0:
+                buf[n] = b
+                self.n = n + 1
+            if b == _EOX:
+                msg = self._finish()
+        return msg
+
+    def _finish(self):
+        # Wrap up a message after its F7 byte
+        self.active = False
+        self.messages += 1
+        if self.streamed:
+            self.stream(self.view[:self.n], True)
+            return None
+        return self.view[:self.n]
+
+    def __str__(self):
+        return ('SysEx: %d messages, %d truncated, %d overflows, '
+            '%d bytes dropped') % (self.messages, self.truncated,
+            self.overflows, self.dropped)
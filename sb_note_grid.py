@@ -0,0 +1,204 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# Deferred note grid rendering for the background image's channel/note grid.
+#
+# Drawing each note on/off with its own fill_region() call, right when the
+# event arrives, means a chord or arpeggio makes lots of small bitmap writes
+# in between USB reads. NoteGrid queues the changes instead, merging repeated
+# changes to the same cell (last one wins), then draws all the pending cells
+# in one pass just before the next scheduled display refresh.
+#
+# The grid has 16 rows (MIDI channels 1-16) by 88 columns (piano notes 21-108,
+# A0 to C8). Cells are numbered (chan - 1) * 88 + (note - 21).
+#
+# A 16x88 note state bitset (176 byte bytearray, 11 bytes per channel) keeps
+# track of which notes are on. That lets repeated note-ons and stray
+# note-offs skip the queue entirely, makes "all notes off" for a channel a
+# scan of 11 bytes, and keeps a running polyphony count for each channel.
+#
+# For velocity shading, use_velocity() loads a ramp of colors into free
+# palette entries and fills a 128-entry velocity to palette index table, so
+# a shaded note costs the same single fill as a plain one.
+#
+from array import array
+
+import bitmaptools
+from micropython import const
+
+
+NOTE_LO = const(21)     # lowest note in the grid (A0)
+NOTE_HI = const(108)    # highest note in the grid (C8)
+COLS = const(88)        # notes per channel row
+CELLS = const(16 * 88)
+_NONE = const(0xff)     # pending color for a cell that isn't queued
+
+
+class NoteGrid:
+    def __init__(self, bitmap, x0=28, y0=16, dx=3, dy=6, on=2, off=0):
+        # Prepare a note grid over a bitmap
+        # - bitmap: displayio.Bitmap with the grid (e.g. the background)
+        # - x0, y0: top left pixel of the cell for channel 1, note 21
+        # - dx, dy: pixel pitch between cells (notes, channels)
+        # - on, off: palette indexes for note on and note off
+        # These defaults come from measuring pixels of background.bmp in an
+        # image editor. Cells are 2x5 px with a 1 px gap of background.
+        self.bitmap = bitmap
+        self.x0 = x0
+        self.y0 = y0
+        self.dx = dx
+        self.dy = dy
+        self.on = on
+        self.off = off
+        self.state = bytearray(CELLS >> 3)          # note on/off bitset
+        self.poly = bytearray(16)                   # notes on per channel
+        self.max_poly = 0       # most notes on at once in one channel
+        self.redundant = 0      # note changes skipped (no state change)
+        self.shade = bytearray([on] * 256)          # velocity -> color
+        self.colors = bytearray(CELLS)              # shade of each note on
+        self.pending = bytearray([_NONE] * CELLS)   # queued color per cell
+        self.queue = array('H', [0] * CELLS)        # queued cell numbers
+        self.count = 0          # number of queued cells
+        self.changes = 0        # note changes queued (before merging)
+        self.cells = 0          # cells written (after merging)
+        self.frames = 0         # calls to draw() that wrote cells
+        self.last_cells = 0     # cells written by the last draw()
+        self.max_cells = 0      # most cells written by one draw()
+
+    def __len__(self):
+        return self.count
+
+    def _queue(self, cell, color):
+        # Queue a cell change (later changes to the same cell replace it)
+        self.changes += 1
+        if self.pending[cell] == _NONE:
+            self.queue[self.count] = cell
+            self.count += 1
+        self.pending[cell] = color
+
+    def use_velocity(self, palette, first=8, levels=8):
+        # Switch to velocity shaded notes
+        # - palette: displayio.Palette for the grid's bitmap
+        # - first: first free palette index for the color ramp
+        # - levels: number of shades (palette needs first + levels entries)
+        # The ramp goes from 1/levels of the note on color up to the full
+        # note on color.
+        c = palette[self.on]
+        for k in range(levels):
+            f = k + 1
+            palette[first + k] = (
+                ((((c >> 16) & 0xff) * f // levels) << 16)
+                | ((((c >> 8) & 0xff) * f // levels) << 8)
+                | ((c & 0xff) * f // levels))
+        shade = self.shade
+        for v in range(1, 128):
+            shade[v] = first + ((v - 1) * levels // 127)
+
+    def note_on(self, chan, note, velocity=127):
+        # Turn a note on
+        # - chan: MIDI channel in 1-16
+        # - note: note number (notes outside 21-108 get ignored)
+        # - velocity: 1-127 (0 means note off, and bad bytes above 127 get
+        #   the plain note on color)
+        if velocity == 0:
+            self.note_off(chan, note)
+            return
+        if not ((1 <= chan <= 16) and (NOTE_LO <= note <= NOTE_HI)):
+            return
+        cell = (chan - 1) * COLS + (note - NOTE_LO)
+        color = self.shade[velocity]
+        i = cell >> 3
+        m = 1 << (cell & 7)
+        if self.state[i] & m:
+            # Already on, so only redraw if the shade changed
+            if self.colors[cell] == color:
+                self.redundant += 1
+                return
+        else:
+            self.state[i] |= m
+            p = self.poly[chan - 1] + 1
+            self.poly[chan - 1] = p
+            if p > self.max_poly:
+                self.max_poly = p
+        self.colors[cell] = color
+        self._queue(cell, color)
+
+    def note_off(self, chan, note):
+        # Turn a note off (same args as note_on)
+        if not ((1 <= chan <= 16) and (NOTE_LO <= note <= NOTE_HI)):
+            return
+        cell = (chan - 1) * COLS + (note - NOTE_LO)
+        i = cell >> 3
+        m = 1 << (cell & 7)
+        if not (self.state[i] & m):
+            self.redundant += 1
+            return
+        self.state[i] &= ~m
+        self.poly[chan - 1] -= 1
+        self._queue(cell, self.off)
+
+    def all_off(self, chan):
+        # Turn off all the notes that are on for a channel (All Notes Off)
+        # - chan: MIDI channel in 1-16
+        if not (1 <= chan <= 16) or self.poly[chan - 1] == 0:
+            return
+        state = self.state
+        first = (chan - 1) * (COLS >> 3)
+        off = self.off
+        for i in range(first, first + (COLS >> 3)):
+            b = state[i]
+            if b == 0:
+                continue
+            state[i] = 0
+            cell = i << 3
+            while b:
+                if b & 1:
+                    self._queue(cell, off)
+                b >>= 1
+                cell += 1
+        self.poly[chan - 1] = 0
+
+    def polyphony(self, chan):
+        # Get the number of notes on for a channel (1-16)
+        return self.poly[chan - 1]
+
+    def draw(self, limit=CELLS):
+        # Fill all the queued cells (call this just before a refresh)
+        # - limit: most cells to fill in one call (the rest stay queued for
+        #   the next call, so the cost per frame can be bounded)
+        # - returns: number of cells filled
+        n = self.count
+        if n == 0:
+            return 0
+        if n > limit:
+            n = limit
+        queue = self.queue
+        pending = self.pending
+        bitmap = self.bitmap
+        fill = bitmaptools.fill_region
+        x0 = self.x0
+        y0 = self.y0
+        dx = self.dx
+        dy = self.dy
+        for i in range(n):
+            cell = queue[i]
+            chan = cell // COLS
+            x1 = x0 + dx * (cell - chan * COLS)
+            y1 = y0 + dy * chan
+            fill(bitmap, x1, y1, x1 + dx - 1, y1 + dy - 1, pending[cell])
+            pending[cell] = _NONE
+        # Keep cells that didn't fit in this frame at the front of the queue
+        if n < self.count:
+            queue[:self.count - n] = queue[n:self.count]
+        self.count -= n
+        self.cells += n
+        self.frames += 1
+        self.last_cells = n
+        if n > self.max_cells:
+            self.max_cells = n
+        return n
+
+    def __str__(self):
+        return ('NoteGrid: %d changes, %d redundant, %d cells in %d frames, '
+            'max %d cells, max polyphony %d') % (self.changes, self.redundant,
+            self.cells, self.frames, self.max_cells, self.max_poly)
@@ -0,0 +1,78 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# Frame rate capped display refresh scheduler.
+#
+# With auto_refresh off, each display.refresh() call adds the whole picodvi
+# refresh time to USB MIDI read latency. Calling it for every event means a
+# burst of notes costs one refresh per note, even though nobody can see more
+# than one frame per monitor refresh anyway. Instead, event handlers mark the
+# display dirty (cheap), and the input loop calls tick() once per pass to
+# refresh at most once per frame interval (or, with no cap, only on idle
+# ticks).
+#
+from sb_ticks import ticks_diff
+
+
+class RefreshScheduler:
+    def __init__(self, refresh, ticks_ms, fps=30, before=None):
+        # Prepare a refresh scheduler
+        # - refresh: function that draws a frame (e.g. display.refresh)
+        # - ticks_ms: function returning milliseconds (supervisor.ticks_ms)
+        # - fps: frame rate cap, or 0 to refresh only on idle ticks (with no
+        #   cap)
+        # - before: optional function to call just before each refresh (for
+        #   applying deferred bitmap updates)
+        self.refresh = refresh
+        self.before = before
+        self.ticks_ms = ticks_ms
+        self.frame_ms = (1000 // fps) if fps > 0 else 0
+        self.dirty = False
+        self.last = 0           # ticks_ms() at the start of the last frame
+        self.marks = 0          # times the display was marked dirty
+        self.frames = 0         # frames rendered
+        self.worst_ms = 0       # longest refresh time
+
+    def mark(self):
+        # Note that the display needs a refresh
+        self.dirty = True
+        self.marks += 1
+
+    def tick(self, now, idle):
+        # Refresh the display if it's dirty and it's time for a frame
+        # - now: current supervisor.ticks_ms() value
+        # - idle: True if the input loop had nothing to do this tick
+        # - returns: True if a frame was rendered
+        if not self.dirty:
+            return False
+        if self.frame_ms == 0:
+            if not idle:
+                return False
+        elif ticks_diff(now, self.last) < self.frame_ms:
+            # Idle ticks get the cap too, or a trickle of events with gaps
+            # in between could refresh once per event
+            return False
+        self.last = now
+        self.dirty = False
+        t0 = self.ticks_ms()
+        if self.before:
+            self.before()
+        self.refresh()
+        dt = ticks_diff(self.ticks_ms(), t0)
+        if dt > self.worst_ms:
+            self.worst_ms = dt
+        self.frames += 1
+        return True
+
+    def skipped(self):
+        # Get number of dirty marks that didn't get a frame of their own
+        return self.marks - self.frames
+
+    def reset_stats(self):
+        self.marks = 0
+        self.frames = 0
+        self.worst_ms = 0
+
+    def __str__(self):
+        return 'Refresh: %d frames, %d skipped, worst %d ms' % (
+            self.frames, self.skipped(), self.worst_ms)
@@ -0,0 +1,140 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# Scrolling text history pane with fixed-width character cells.
+#
+# Setting the text of an adafruit_display_text label rebuilds the label's
+# bitmap and allocates memory every time. HistoryPane uses TileGrids over the
+# glyph bitmap of a fixed-width font (like terminalio.FONT), with one tile
+# per character cell. Writing text just stores glyph tile indexes into a
+# TileGrid, so updates cost a few stores with no allocation or re-layout.
+#
+# Each line of history is a single-row TileGrid inside a scroll Group. Adding
+# a line overwrites the oldest row's tiles, moves that row to just below the
+# newest one, and slides the scroll Group up by one line. That's one row of
+# tile writes and two y stores, no matter how many rows are on screen. Since
+# the y positions keep growing, they get reset to the top every _RENORM
+# lines, well before they could overflow.
+#
+# NOTE: Index the TileGrid with an int (tg[i]) rather than an (x, y) tuple,
+# because building the tuple would allocate.
+#
+from displayio import Group, Palette, TileGrid
+from micropython import const
+
+
+_RENORM = const(1024)  # lines between y position resets
+
+
+def _glyph_tiles(font):
+    # Make a character code to tile index table for ASCII. Characters without
+    # a glyph (including control characters) show as a space.
+    tiles = bytearray(128)
+    for c in range(32, 127):
+        g = font.get_glyph(c)
+        if g is not None:
+            tiles[c] = g.tile_index
+    space = tiles[32]
+    for c in range(128):
+        if c < 32 or c == 127:
+            tiles[c] = space
+    return tiles
+
+def _text_palette(color):
+    # Make a 2 color palette with a transparent background
+    palette = Palette(2)
+    palette[0] = 0x000000
+    palette[1] = color
+    palette.make_transparent(0)
+    return palette
+
+
+class HistoryPane:
+    def __init__(self, font, cols, rows, x=0, y=0, color=0xFFFFFF):
+        # Make a scrolling history pane (newest line at the bottom)
+        # - font: fixed-width fontio.BuiltinFont (e.g. terminalio.FONT)
+        # - cols, rows: size of the pane in character cells
+        # - x, y: position of the top left corner in pixels
+        # - color: text color (the background is transparent)
+        # Add the group attribute to a displayio Group to show the pane.
+        (w, h) = font.get_bounding_box()[:2]
+        tiles = _glyph_tiles(font)
+        space = tiles[32]
+        self.tiles = tiles
+        self.space = space
+        self.palette = _text_palette(color)
+        self.group = Group(x=x, y=y)
+        self.scroll = Group()   # slides up one line per added line
+        self.group.append(self.scroll)
+        self.lines = []     # one single-row TileGrid per line
+        for r in range(rows):
+            tg = TileGrid(font.bitmap, pixel_shader=self.palette,
+                width=cols, height=1, tile_width=w, tile_height=h,
+                default_tile=space, x=0, y=r * h)
+            self.lines.append(tg)
+            self.scroll.append(tg)
+        self.cols = cols
+        self.rows = rows
+        self.char_h = h
+        self.head = 0       # index in lines of the oldest (top) row
+        self.offset = 0     # lines scrolled since the last y position reset
+        self.added = 0      # lines added
+
+    def add(self, buf, start, end):
+        # Add a line from a buffer at the bottom, scrolling the rest up
+        # - buf: bytes, bytearray, or memoryview with ASCII text
+        # - start, end: range of indexes in buf to show (text stops at the
+        #   first newline and gets truncated at the pane width)
+        # Overwrite the oldest row with the new line
+        head = self.head
+        tg = self.lines[head]
+        tiles = self.tiles
+        i = 0
+        cols = self.cols
+        while start < end and i < cols:
+            c = buf[start]
+            if c == 0x0a:
+                break
+            tg[i] = tiles[c & 0x7f]
+            i += 1
+            start += 1
+        space = self.space
+        while i < cols:
+            tg[i] = space
+            i += 1
+        # Move the new line below the newest one and scroll up by one line
+        rows = self.rows
+        h = self.char_h
+        offset = self.offset + 1
+        tg.y = (offset + rows - 1) * h
+        self.scroll.y = -offset * h
+        head += 1
+        if head == rows:
+            head = 0
+        self.head = head
+        self.offset = offset
+        self.added += 1
+        if offset >= _RENORM:
+            self._renorm()
+
+    def _renorm(self):
+        # Move the rows back to the top of the scroll group (same on-screen
+        # positions, but with small y values)
+        lines = self.lines
+        rows = self.rows
+        h = self.char_h
+        k = self.head
+        for r in range(rows):
+            lines[k].y = r * h
+            k += 1
+            if k == rows:
+                k = 0
+        self.scroll.y = 0
+        self.offset = 0
+
+    def clear(self):
+        # Fill all rows with spaces
+        space = self.space
+        for tg in self.lines:
+            for i in range(self.cols):
+                tg[i] = space
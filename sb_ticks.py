@@ -0,0 +1,20 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+#
+# Wrap-safe arithmetic for supervisor.ticks_ms() timestamps.
+#
+# supervisor.ticks_ms() wraps around at 2**29 ms (about 6.2 days), so time
+# differences have to be taken modulo 2**29. The modules that schedule
+# flushes, refreshes, and display updates all use ticks_diff() from here.
+#
+from micropython import const
+
+
+_TICKS_MASK = const(0x1fffffff)  # supervisor.ticks_ms() wraps at 2**29
+
+
+def ticks_diff(new, old):
+    # Get the milliseconds from old to new
+    # - new, old: supervisor.ticks_ms() values (old is the earlier one)
+    # - returns: elapsed time in 0..2**29-1
+    return (new - old) & _TICKS_MASK
@@ -10,7 +10,6 @@
 # - https://docs.python.org/3/glossary.html#term-iterable
 # - https://docs.micropython.org/en/latest/reference/speed_python.html
 #
-import gc
 from micropython import const
 from usb import core
 from usb.core import USBError, USBTimeoutError
@@ -18,6 +17,39 @@ from usb.core import USBError, USBTimeoutError
 import sb_usb_descriptor
 
 
+def check_usb_device(device, device_cache):
+    # Check if a usb device matches the usb midi device fingerprint
+    # - device: a usb.core.Device
+    # - device_cache: dictionary of previously checked device descriptors
+    # - return: ScanResult object for a midi device, False if the device was
+    #   already checked, or None for other devices
+    # Exceptions: may raise ValueError, usb.core.USBError, or
+    #   usb.core.USBTimeoutError
+    #
+    # Read descriptors to identify devices by type
+    desc = sb_usb_descriptor.Descriptor(device)
+    # Including the port numbers lets identical devices on a hub each get
+    # their own cache entry
+    k = str(desc.to_bytes()) + str(getattr(device, 'port_numbers', ''))
+    if k in device_cache:
+        return False
+    # Remember this device to avoid repeatedly checking it later
+    device_cache[k] = True
+    # Compare descriptor to expected midi device fingerprint
+    desc.read_configuration(device)
+    print(desc)
+    # Get tuples of class/subclass/protocol for device and interfaces
+    d = desc.dev_class_subclass()
+    i0 = desc.int_class_subclass(0)
+    i1 = desc.int_class_subclass(1)
+    if d == (0, 0) and i0 == (1, 1) and i1 == (1, 3):
+        print("interface 0 is Audio Control")
+        print("interface 1 is MIDI Streaming")
+        return ScanResult(device, desc)
+    else:
+        print("IGNORING UNRECOGNIZED DEVICE")
+        return None
+
 def find_usb_device(device_cache):
     # Find a usb midi device by inspecting usb device descriptors
     # - device_cache: dictionary of previously checked device descriptors
@@ -25,28 +57,9 @@ def find_usb_device(device_cache):
     # Exceptions: may raise usb.core.USBError or usb.core.USBTimeoutError
     #
     for device in core.find(find_all=True):
-        # Read descriptors to identify devices by type
         try:
-            desc = sb_usb_descriptor.Descriptor(device)
-            k = str(desc.to_bytes())
-            if k in device_cache:
-                return None
-            # Remember this device to avoid repeatedly checking it later
-            device_cache[k] = True
-            # Compare descriptor to expected midi device fingerprint
-            desc.read_configuration(device)
-            print(desc)
-            # Get tuples of class/subclass/protocol for device and interfaces
-            d = desc.dev_class_subclass()
-            i0 = desc.int_class_subclass(0)
-            i1 = desc.int_class_subclass(1)
-            if d == (0, 0) and i0 == (1, 1) and i1 == (1, 3):
-                print("interface 0 is Audio Control")
-                print("interface 1 is MIDI Streaming")
-                return ScanResult(device, desc)
-            else:
-                print("IGNORING UNRECOGNIZED DEVICE")
-                return None
+            r = check_usb_device(device, device_cache)
+            return r if r else None
         except ValueError as e:
             # This can happen if we get a 0 length device descriptor. Usually
             # it works fine to ignore the error and try again.
@@ -55,6 +68,26 @@ def find_usb_device(device_cache):
             print("find_usb_device() USBError: '%s'" % e)
     return None
 
+def find_usb_devices(device_cache):
+    # Find all the usb midi devices on the bus (e.g. several behind a hub)
+    # - device_cache: dictionary of previously checked device descriptors
+    # - return: list of ScanResult objects (empty if nothing new was found)
+    # Exceptions: may raise usb.core.USBError or usb.core.USBTimeoutError
+    #
+    found = []
+    for device in core.find(find_all=True):
+        try:
+            r = check_usb_device(device, device_cache)
+            if r:
+                found.append(r)
+        except ValueError as e:
+            # This can happen if we get a 0 length device descriptor. Usually
+            # it works fine to ignore the error and try again.
+            print(e)
+        except USBError as e:
+            print("find_usb_devices() USBError: '%s'" % e)
+    return found
+
 
 class ScanResult:
     def __init__(self, device, descriptor):
@@ -67,10 +100,135 @@ class ScanResult:
         self.int1_info = descriptor.int_class_subclass(1)
 
 
+class ReadTimeout:
+    def __init__(self, min_ms=3, max_ms=24, idle_reads=32):
+        # Adaptive timeout policy for USB MIDI bulk reads
+        # - min_ms: timeout to use while packets are arriving
+        # - max_ms: longest timeout to back off to after sustained idle
+        # - idle_reads: number of empty reads in a row before each back off
+        #
+        # While packets are arriving, short timeouts keep the gaps between
+        # transfers small. Once the bus goes quiet, the timeout doubles after
+        # every idle_reads empty reads (up to max_ms) so the main loop stops
+        # spinning through hundreds of None yields per second. The first read
+        # that returns packets snaps the timeout back to min_ms.
+        #
+        self.min_ms = min_ms
+        self.max_ms = max(min_ms, max_ms)
+        self.idle_reads = max(1, idle_reads)
+        self.ms = min_ms      # timeout for the next read
+        self.hits = 0         # reads that returned packets
+        self.misses = 0       # reads that timed out or returned 0 bytes
+        self.idle = 0         # empty reads since last hit or back off
+
+    def hit(self):
+        # Record a read that returned packets
+        # - returns: timeout in ms for the next read
+        self.hits += 1
+        self.idle = 0
+        self.ms = self.min_ms
+        return self.min_ms
+
+    def miss(self):
+        # Record a read that timed out or returned 0 bytes
+        # - returns: timeout in ms for the next read
+        self.misses += 1
+        self.idle += 1
+        if self.idle >= self.idle_reads:
+            self.idle = 0
+            self.ms = min(self.max_ms, self.ms * 2)
+        return self.ms
+
+    def __str__(self):
+        return 'Read timeout: %d ms (%d-%d), hits: %d, misses: %d' % (
+            self.ms, self.min_ms, self.max_ms, self.hits, self.misses)
+
+
+# While one IN endpoint is delivering packets, the others get polled with
+# this short timeout so they don't add latency to the busy endpoint
+_BUSY_POLL_MS = const(1)
+
+
+def _max_packet(endpoints):
+    # Get the read buffer size for a list of IN endpoints: the largest
+    # wMaxPacketSize, so no endpoint's transfers get cut short, up to 64
+    size = 4
+    for e in endpoints:
+        size = max(size, min(64, e.wMaxPacketSize))
+    return size
+
+def _round_robin(owner, bufs, drop=None):
+    # Read several IN endpoints in a fair round-robin schedule.
+    #
+    # Each pass reads every source once, in order. If any source returned
+    # packets during the previous pass, every read gets a short poll so the
+    # quiet sources don't hold up the busy one. Once everything goes quiet,
+    # only one source per pass gets its adaptive ReadTimeout (taking turns),
+    # and the others get a short poll. That way, an idle pass waits for one
+    # timeout rather than for the sum of all of them.
+    #
+    # - owner: MIDIInputDevice or MIDIDeviceManager. Its _sources attribute
+    #   is a list of (device index, endpoint index, read function, endpoint
+    #   address, ReadTimeout) tuples. Each transfer gets tagged by setting
+    #   its endpoint_index and transfer_len attributes (and device_index, if
+    #   drop is set).
+    # - bufs: list of read buffers to rotate through
+    # - drop: function to call with (device index, error) when a read raises
+    #   USBError, or None to let the error propagate. After a drop, polling
+    #   starts a new pass over the updated owner._sources.
+    # - yields: index into bufs of a buffer holding a new transfer, or -1
+    #   after a pass where no source had any packets
+    # Exceptions: may raise USBError
+    #
+    count = len(bufs)
+    k = 0
+    busy = False
+    slow = 0    # source that gets the long timeout on idle passes
+    while True:
+        got = False
+        sources = owner._sources
+        i = 0
+        for (d, e, read, addr, tmo) in sources:
+            ms = tmo.ms if (i == slow and not busy) else _BUSY_POLL_MS
+            i += 1
+            try:
+                n = read(addr, bufs[k], ms)
+            except USBTimeoutError as err:
+                # This is normal. Timeouts happen fairly often.
+                n = 0
+            except USBError as err:
+                # This may happen when a device is unplugged
+                if drop is None:
+                    raise err
+                drop(d, err)
+                slow = 0
+                break
+            if n == 0:
+                tmo.miss()
+                continue
+            tmo.hit()
+            got = True
+            if drop is not None:
+                owner.device_index = d
+            owner.endpoint_index = e
+            owner.transfer_len = n
+            yield k
+            if count > 1:
+                k = (k + 1) % count
+        busy = got
+        if not got:
+            slow = (slow + 1) % max(1, len(sources))
+            yield -1
+
+
 class MIDIInputDevice:
-    def __init__(self, scan_result):
+    def __init__(self, scan_result, timeout=None):
         # Prepare for reading input events from specified device
         # - scan_result: a ScanResult instance
+        # - timeout: a ReadTimeout instance for tuning the read timeout
+        #   policy. If this is None, each IN endpoint gets its own
+        #   ReadTimeout() with the default bounds. Otherwise, all endpoints
+        #   share the one you provide.
         # Exceptions: may raise usb.core.USBError
         #
         device = scan_result.device
@@ -89,8 +247,44 @@ class MIDIInputDevice:
         endpoint_out = None if (len(outs) < 1) else outs[0]
         self.int1_endpoint_in = endpoint_in
         self.int1_endpoint_out = endpoint_out
+        # Multi-port interfaces may spread their cables over several IN
+        # endpoints, so keep track of all of them
+        self.endpoints_in = ins
+        if timeout is None:
+            self.timeouts = [ReadTimeout() for _ in range(max(1, len(ins)))]
+        else:
+            self.timeouts = [timeout] * max(1, len(ins))
+        self.timeout = self.timeouts[0]
+        # Tags for the most recent transfer: index into endpoints_in of the
+        # endpoint it came from, and its length in bytes
+        self.endpoint_index = 0
+        self.transfer_len = 0
+        # Polling list for the round-robin schedule (see _round_robin())
+        read = device.read
+        self._sources = [(0, e, read, ep.bEndpointAddress, self.timeouts[e])
+            for (e, ep) in enumerate(ins)]
 
-    def input_event_generator(self):
+    def read_buffers(self, count):
+        # Allocate a ring of read buffers for the input generators
+        # - count: number of buffers (1 for the classic single buffer mode)
+        # - returns: (buffers, views) where buffers is a list of bytearrays
+        #   and views[k] is a list of preallocated 4-byte memoryview slices
+        #   (one per usb midi packet) covering buffers[k]
+        #
+        max_packet = _max_packet(self.endpoints_in)
+        buffers = []
+        views = []
+        for _ in range(max(1, count)):
+            data = bytearray(max_packet)
+            view = memoryview(data)  # memoryview reduces heap allocations
+            buffers.append(data)
+            # Slice the buffer into 4-byte packet views just once, up front.
+            # That way, the read loop can hand out views without allocating a
+            # new memoryview for every packet.
+            views.append([view[i:i+4] for i in range(0, max_packet, 4)])
+        return (buffers, views)
+
+    def input_event_generator(self, buffers=1):
         # Read USB input events _as efficiently as possible_.
         #
         # This is a generator that makes an iterable for reading input events.
@@ -99,33 +293,221 @@ class MIDIInputDevice:
         # lookups, function calls, and heap allocations. The goal is to read
         # input fast enough to avoid audible latency glitches.
         #
+        # - buffers: number of read buffers to rotate through. With the
+        #   default of 1, every read overwrites the previous packets. With N
+        #   buffers, packets from a transfer stay intact until N-1 more
+        #   transfers have been read, so consumers can defer processing
+        #   without copying.
         # - returns: iterable that can be used with a for loop
         # - iterable can yield:
         #   1. A memoryview(bytearray(...)) with a 4 byte usb midi packet, or
         #   2. None (read timeout, filtered out clock timing packet, etc)
+        # CAUTION: The memoryviews get reused for later reads, so don't hold
+        # on to them for longer than the buffer rotation allows.
+        # For interfaces with several IN endpoints, self.endpoint_index tells
+        # which endpoint the current packet came from.
         # Exceptions: may raise USBError
         #
+        (bufs, pools) = self.read_buffers(buffers)
+        if len(self.endpoints_in) > 1:
+            # Merge packets from all the IN endpoints
+            for k in _round_robin(self, bufs):
+                if k < 0:
+                    yield None
+                    continue
+                views = pools[k]
+                n = self.transfer_len
+                i = 0
+                while i < n:
+                    yield views[i >> 2]
+                    i += 4
+            return
         addr = self.int1_endpoint_in.bEndpointAddress
-        max_packet = min(64, self.int1_endpoint_in.wMaxPacketSize)
-        data = bytearray(max_packet)
-        view = memoryview(data)  # using memoryview reduces heap allocations
+        count = len(bufs)
+        k = 0
+        data = bufs[0]
+        views = pools[0]
         read = self.device.read  # caching function avoids dictionary lookups
-        ms = const(3)            # read timeout
+        hit = self.timeout.hit   # adaptive read timeout policy
+        miss = self.timeout.miss
+        ms = self.timeout.ms     # read timeout
         while True:
             try:
                 # In theory, using a positional argument for the timeout should
                 # be faster than using a `timeout=ms` keyword argument
                 n = read(addr, data, ms)
                 # Bulk read result will be 0 or more 4-byte midi packets, so
-                # split that up into 4-byte memoryview slices
-                for i in range(0, n, 4):
-                    yield view[i:i+4]
+                # hand out the matching preallocated 4-byte views. The while
+                # loop avoids allocating a range iterator for each read.
+                i = 0
+                while i < n:
+                    yield views[i >> 2]
+                    i += 4
                 # In case of 0 byte bulk read, we still need to yield something
                 if n == 0:
+                    ms = miss()
                     yield None
+                    continue
+                ms = hit()
+                if count > 1:
+                    # Rotate to the next buffer (only after reading packets,
+                    # so timeouts don't use up the older buffers)
+                    k = (k + 1) % count
+                    data = bufs[k]
+                    views = pools[k]
             except USBTimeoutError as e:
                 # This is normal. Timeouts happen fairly often.
+                ms = miss()
                 yield None
             except USBError as e:
                 # This may happen when device is unplugged (not always though)
                 raise e
+
+    def input_batch_generator(self, buffers=1):
+        # Read whole USB bulk transfers _as efficiently as possible_.
+        #
+        # This works like input_event_generator(), but it yields each bulk
+        # transfer in one piece rather than as one 4-byte slice per packet.
+        # For dense input (sequencers, knob sweeps, etc.), that saves a
+        # generator resumption and a memoryview allocation for each packet.
+        # Consumers should walk the packets in a tight local loop like this:
+        #
+        #     for xfer in dev.input_batch_generator():
+        #         if xfer is None:
+        #             continue
+        #         (data, n) = xfer
+        #         for i in range(0, n, 4):
+        #             cin = data[i] & 0x0f
+        #             ...
+        #
+        # - buffers: number of read buffers to rotate through. With N
+        #   buffers, a transfer stays intact until N-1 more transfers have
+        #   been read. For example, with buffers=2, the consumer can work on
+        #   one transfer while the next one is being read.
+        # - returns: iterable that can be used with a for loop
+        # - iterable can yield:
+        #   1. A (bytearray, byte_count) tuple holding 1 or more 4-byte usb
+        #      midi packets. CAUTION: The bytearray gets reused for a later
+        #      read, so don't hold on to it longer than the rotation allows.
+        #   2. None (read timeout or 0 byte read)
+        # For interfaces with several IN endpoints, self.endpoint_index tells
+        # which endpoint the current transfer came from.
+        # Exceptions: may raise USBError
+        #
+        (bufs, _) = self.read_buffers(buffers)
+        if len(self.endpoints_in) > 1:
+            # Merge transfers from all the IN endpoints
+            for k in _round_robin(self, bufs):
+                if k < 0:
+                    yield None
+                else:
+                    yield (bufs[k], self.transfer_len)
+            return
+        addr = self.int1_endpoint_in.bEndpointAddress
+        count = len(bufs)
+        k = 0
+        data = bufs[0]
+        read = self.device.read  # caching function avoids dictionary lookups
+        hit = self.timeout.hit   # adaptive read timeout policy
+        miss = self.timeout.miss
+        ms = self.timeout.ms     # read timeout
+        while True:
+            try:
+                n = read(addr, data, ms)
+                # Bulk read result will be 0 or more 4-byte midi packets
+                if n == 0:
+                    ms = miss()
+                    yield None
+                else:
+                    ms = hit()
+                    yield (data, n)
+                    if count > 1:
+                        k = (k + 1) % count
+                        data = bufs[k]
+            except USBTimeoutError as e:
+                # This is normal. Timeouts happen fairly often.
+                ms = miss()
+                yield None
+            except USBError as e:
+                # This may happen when device is unplugged (not always though)
+                raise e
+
+
+class MIDIDeviceManager:
+    def __init__(self, scan_results):
+        # Open several USB MIDI devices (e.g. controllers on a hub) so they
+        # can all be polled from one loop
+        # - scan_results: list of ScanResult instances
+        # Exceptions: may raise usb.core.USBError
+        #
+        self.devices = [MIDIInputDevice(r) for r in scan_results]
+        self.dropped = []   # devices that were disconnected
+        # Tags for the most recent transfer: index into devices of the
+        # device it came from, index into that device's endpoints_in, and
+        # the transfer length in bytes
+        self.device_index = 0
+        self.endpoint_index = 0
+        self.transfer_len = 0
+        self._build_sources()
+
+    def _build_sources(self):
+        # Flatten the IN endpoints of all devices into one polling list
+        sources = []
+        for (d, dev) in enumerate(self.devices):
+            for (_, e, read, addr, tmo) in dev._sources:
+                sources.append((d, e, read, addr, tmo))
+        self._sources = sources
+
+    def _drop(self, index, err):
+        # Stop polling a device that raised USBError (probably unplugged)
+        # Exceptions: raises USBError once all devices are gone
+        dev = self.devices.pop(index)
+        self.dropped.append(dev)
+        print("Dropped MIDI device %04X:%04X: '%s'" % (
+            dev.device.idVendor, dev.device.idProduct, err))
+        self._build_sources()
+        if not self.devices:
+            raise USBError('No MIDI devices left')
+
+    def input_batch_generator(self, buffers=1):
+        # Read whole USB bulk transfers from all the devices.
+        #
+        # This works like MIDIInputDevice.input_batch_generator(), except it
+        # polls every IN endpoint of every device with the same round-robin
+        # schedule that MIDIInputDevice uses for its own endpoints (see
+        # _round_robin()), so a quiet device can't hold up a busy one.
+        #
+        # When a device raises USBError, it gets moved from self.devices to
+        # self.dropped and the others carry on without it.
+        #
+        # - buffers: number of read buffers to rotate through (see
+        #   MIDIInputDevice.input_batch_generator())
+        # - returns: iterable that can be used with a for loop
+        # - iterable can yield:
+        #   1. A (bytearray, byte_count) tuple holding 1 or more 4-byte usb
+        #      midi packets. self.device_index and self.endpoint_index tell
+        #      where the transfer came from.
+        #   2. None (a pass where no device had any packets)
+        # Exceptions: raises USBError once all devices are gone
+        #
+        if not self.devices:
+            raise USBError('No MIDI devices left')
+        # Size the buffers for the largest IN endpoint of any device
+        eps = []
+        for dev in self.devices:
+            eps.extend(dev.endpoints_in)
+        size = _max_packet(eps)
+        bufs = [bytearray(size) for _ in range(max(1, buffers))]
+        for k in _round_robin(self, bufs, self._drop):
+            if k < 0:
+                yield None
+            else:
+                yield (bufs[k], self.transfer_len)
+
+    def __str__(self):
+        chunks = ['MIDI devices: %d active, %d dropped' % (
+            len(self.devices), len(self.dropped))]
+        for dev in self.devices:
+            chunks.append('  %04X:%04X %s' % (
+                dev.device.idVendor, dev.device.idProduct, dev.timeout))
+        return '\n'.join(chunks)
@@ -0,0 +1,96 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+"""
+Host-side micro-benchmark for CIN dispatch: if/elif chain vs. lookup table.
+
+Both versions call the same trivial handlers, so the difference comes down
+to how each one finds the handler. The message mix is modeled on a
+keyboard with aftertouch and a few knobs: mostly notes, then pressure, CC,
+and pitch bend, with a little SysEx.
+
+Usage: python3 tools/bench_dispatch.py [packets]
+"""
+import random
+import sys
+import time
+
+import host_shim
+from sb_midi_dispatch import CINDispatch
+
+
+# (CIN, status, weight) for a realistic mix of messages
+MIX = [
+    (0x09, 0x90, 30),   # note on
+    (0x08, 0x80, 30),   # note off
+    (0x0d, 0xd0, 15),   # channel pressure
+    (0x0b, 0xb0, 12),   # control change
+    (0x0a, 0xa0, 5),    # polyphonic key pressure
+    (0x0e, 0xe0, 5),    # pitch bend
+    (0x04, 0xf0, 2),    # sysex
+    (0x02, 0xf2, 1),    # system common
+]
+
+def make_packets(count):
+    rnd = random.Random(1)
+    choices = []
+    for (cin, status, weight) in MIX:
+        choices += [(cin, status)] * weight
+    packets = []
+    for _ in range(count):
+        (cin, status) = rnd.choice(choices)
+        packets.append(bytearray([cin, status | rnd.randrange(16),
+            rnd.randrange(128), rnd.randrange(128)]))
+    return packets
+
+def handler(data, act, pos):
+    return pos + data[2]
+
+def run_chain(packets):
+    h_off = h_on = h_pp = h_cc = h_cp = h_pb = h_sx = h_other = handler
+    for data in packets:
+        cin = data[0] & 0x0f
+        if cin == 0x08:
+            h_off(data, 7, 0)
+        elif cin == 0x09:
+            h_on(data, 7, 0)
+        elif cin == 0x0a:
+            h_pp(data, 7, 0)
+        elif cin == 0x0b:
+            h_cc(data, 7, 0)
+        elif cin == 0x0d:
+            h_cp(data, 7, 0)
+        elif cin == 0x0e:
+            h_pb(data, 7, 0)
+        elif 0x04 <= cin <= 0x07:
+            h_sx(data, 7, 0)
+        else:
+            h_other(data, 7, 0)
+
+def run_table(packets):
+    dispatch = CINDispatch(handler)
+    for cin in (0x04, 0x05, 0x06, 0x07, 0x08, 0x09, 0x0a, 0x0b, 0x0d, 0x0e):
+        dispatch.set(cin, handler)
+    handlers = dispatch.table
+    for data in packets:
+        handlers[data[0] & 0x0f](data, 7, 0)
+
+def bench(label, fn, packets):
+    best = None
+    for _ in range(5):
+        t0 = time.perf_counter()
+        fn(packets)
+        dt = time.perf_counter() - t0
+        best = dt if (best is None) else min(best, dt)
+    print('%-6s %8.1f ms  %6.0f ns/packet' % (
+        label, best * 1000, best * 1e9 / len(packets)))
+    return best
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    packets = make_packets(count)
+    print('%d packets' % count)
+    a = bench('chain', run_chain, packets)
+    b = bench('table', run_table, packets)
+    print('table speedup: %.2fx' % (a / b))
+
+main()
@@ -0,0 +1,83 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+"""
+Host-side benchmark for the MIDIInputDevice read generators.
+
+This compares per-packet mode (input_event_generator) with whole-transfer
+batch mode (input_batch_generator) by feeding both from a fake usb.core
+device. Absolute numbers from CPython won't match a Fruit Jam, but the ratio
+between the two modes gives a rough idea of the per-packet overhead.
+
+Usage: python3 tools/bench_input.py [transfers]
+"""
+import contextlib
+import io
+import sys
+import time
+
+import host_shim
+from host_shim import FakeDevice
+import sb_usb_midi
+
+
+def make_device(script):
+    host_shim.detach_all()
+    host_shim.attach(FakeDevice(script))
+    cache = {}
+    r = None
+    # Keep the descriptor dump from cluttering the benchmark results
+    with contextlib.redirect_stdout(io.StringIO()):
+        while r is None:
+            r = sb_usb_midi.find_usb_device(cache)
+        return sb_usb_midi.MIDIInputDevice(r)
+
+def per_packet(dev, transfers):
+    # Consume packets one slice at a time (like code.py's main loop)
+    total = 0
+    reads = 0
+    for data in dev.input_event_generator():
+        if data is None:
+            reads += 1
+            if reads >= transfers:
+                break
+            continue
+        total += data[0] & 0x0f
+    return total
+
+def batch(dev, transfers):
+    # Consume whole transfers with a tight local loop
+    total = 0
+    reads = 0
+    for xfer in dev.input_batch_generator():
+        if xfer is None:
+            reads += 1
+            if reads >= transfers:
+                break
+            continue
+        (data, n) = xfer
+        for i in range(0, n, 4):
+            total += data[i] & 0x0f
+    return total
+
+def run(label, fn, script, transfers):
+    dev = make_device(script)
+    t0 = time.perf_counter()
+    fn(dev, transfers)
+    dt = time.perf_counter() - t0
+    packets = transfers * 16
+    print('%-10s %8.1f ms  %6.0f ns/packet' % (
+        label, dt * 1000, dt * 1e9 / max(1, packets)))
+    return dt
+
+def main():
+    transfers = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    # Dense traffic: full 64-byte transfers of note on/off, each followed by
+    # a timeout so the consumers can count transfers without peeking
+    xfer = bytes([0x09, 0x90, 60, 100, 0x08, 0x80, 60, 0] * 8)
+    script = [xfer, None]
+    print('%d transfers of %d packets each' % (transfers, len(xfer) // 4))
+    a = run('per-packet', per_packet, script, transfers)
+    b = run('batch', batch, script, transfers)
+    print('batch mode speedup: %.2fx' % (a / b))
+
+main()
@@ -0,0 +1,93 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+"""
+Host-side allocation checks for the MIDI input hot path.
+
+This reads packets from a fake usb.core device under tracemalloc and fails
+if steady-state reads allocate any memory. The generator is allowed to
+allocate its buffer and packet views when it starts, but after warm-up,
+handing out packets should not touch the heap at all. The same goes for
+formatting log messages with the sb_midi_fmt functions.
+
+Usage: python3 tools/check_alloc.py
+"""
+import contextlib
+import io
+from itertools import repeat
+import sys
+import tracemalloc
+
+import host_shim
+from host_shim import FakeDevice
+import sb_midi_fmt as fmt
+import sb_usb_midi
+
+
+def open_device(script):
+    host_shim.detach_all()
+    host_shim.attach(FakeDevice(script))
+    cache = {}
+    r = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        while r is None:
+            r = sb_usb_midi.find_usb_device(cache)
+        return sb_usb_midi.MIDIInputDevice(r)
+
+def measure(gen, count):
+    # Pull count packets from gen and return peak bytes allocated meanwhile
+    nxt = next
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    (start, _) = tracemalloc.get_traced_memory()
+    for _ in range(count):
+        nxt(gen)
+    (_, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - start
+
+def format_messages(size=64):
+    # Generator that formats a mix of log messages into a reusable buffer
+    out = bytearray(size)
+    mv = memoryview(out)
+    views = [mv[:n] for n in range(size + 1)]
+    packet = bytes([0x09, 0x90, 60, 100])
+    while True:
+        yield views[fmt.event(out, 0, b'On  ', 1, 60, 100)]
+        yield views[fmt.event(out, 0, b'CP  ', 16, 127)]
+        yield views[fmt.hexdump(out, 0, packet)]
+
+def main():
+    # Full 64-byte transfers of note on/off packets
+    xfer = bytes([0x09, 0x90, 60, 100, 0x08, 0x80, 60, 0] * 8)
+    dev = open_device([xfer])
+    packets = 16 * 1000
+    # Harness overhead, measured with an iterator that never allocates
+    base = measure(repeat(None), packets)
+    # CPython boxes ints above 256, so bumping a hit/miss counter or
+    # computing a digit table index briefly allocates int objects. On
+    # MicroPython, those are immediate values (no heap), so allow for a
+    # couple of boxed ints at a time.
+    base += 2 * sys.getsizeof(1 << 20)
+    ok = True
+    for buffers in (1, 2):
+        gen = dev.input_event_generator(buffers)
+        # Warm up: first pass allocates the buffers and packet views
+        for _ in range(64):
+            next(gen)
+        # Steady state: thousands of packets should allocate nothing
+        peak = max(0, measure(gen, packets) - base)
+        print('buffers=%d, %d packets: %d bytes allocated' % (
+            buffers, packets, peak))
+        ok = ok and (peak <= 0)
+    # Formatting log messages should not allocate either
+    gen = format_messages()
+    next(gen)   # warm up: first step allocates the buffer and views
+    peak = max(0, measure(gen, packets) - base)
+    print('formatter, %d messages: %d bytes allocated' % (packets, peak))
+    ok = ok and (peak <= 0)
+    if not ok:
+        print('FAIL: steady-state hot path allocated memory')
+        sys.exit(1)
+    print('OK')
+
+main()
@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+"""
+Host-side checks for MIDI clock tracking (sb_midi_clock.ClockTracker).
+
+Many sequencers keep sending timing clocks while they're stopped. Those
+clocks should still feed the tempo estimate, but the song position must
+only move while playing.
+
+Usage: python3 tools/check_clock.py
+"""
+import sys
+
+import host_shim
+from sb_midi_clock import ClockTracker, PLAYING, PPQN, STOPPED
+
+
+failures = []
+
+def check(ok, label):
+    print('%s: %s' % ('ok  ' if ok else 'FAIL', label))
+    if not ok:
+        failures.append(label)
+
+def clocks(clock, count, now, step_ms):
+    # Send count timing clocks, step_ms apart, starting at now
+    for _ in range(count):
+        clock.realtime(0xf8, now)
+        now += step_ms
+    return now
+
+def main():
+    # Clocks 25 ms apart make 600 ms beats (100 BPM)
+    clock = ClockTracker()
+    now = clocks(clock, 3 * PPQN, 1000, 25)
+    check(clock.state == STOPPED, 'stopped before Start')
+    check(clock.ticks == 0, 'clocks while stopped do not move the position '
+        '(got %d)' % clock.ticks)
+    check(clock.position() == (1, 1), 'position stays at 1:1')
+    check(clock.bpm10() == 1000, 'tempo tracked while stopped (got %d)' % (
+        clock.bpm10()))
+
+    # Start, then play 5 beats
+    clock.realtime(0xfa, now)
+    now = clocks(clock, 5 * PPQN, now, 25)
+    check(clock.state == PLAYING, 'playing after Start')
+    check(clock.position() == (2, 2), 'position after 5 beats (got %d:%d)' % (
+        clock.position()))
+
+    # Stop with clocks still coming, then Continue for 1 more beat
+    clock.realtime(0xfc, now)
+    now = clocks(clock, 2 * PPQN, now, 25)
+    check(clock.position() == (2, 2), 'position holds while stopped')
+    clock.realtime(0xfb, now)
+    now = clocks(clock, PPQN, now, 25)
+    check(clock.position() == (2, 3), 'Continue resumes from the same spot '
+        '(got %d:%d)' % clock.position())
+    check(clock.total == 11 * PPQN, 'total counts every clock (got %d)' % (
+        clock.total))
+
+    # Start goes back to the top
+    clock.realtime(0xfa, now)
+    check(clock.position() == (1, 1), 'Start resets the position')
+
+    if failures:
+        print('FAIL: %d checks failed' % len(failures))
+        sys.exit(1)
+    print('OK')
+
+main()
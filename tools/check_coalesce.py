@@ -0,0 +1,148 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+"""
+Host-side checks for message coalescing (sb_midi_coalesce.Coalescer).
+
+The input loop stops a flush once it runs out of time or packet budget, then
+picks it up again on a later pass. Meanwhile, more values get held. These
+checks make sure partial flushes keep the pending queue in order without
+running off the end of it.
+
+Usage: python3 tools/check_coalesce.py
+"""
+import sys
+
+import host_shim
+from sb_midi_coalesce import Coalescer
+
+
+failures = []
+
+def check(ok, label):
+    print('%s: %s' % ('ok  ' if ok else 'FAIL', label))
+    if not ok:
+        failures.append(label)
+
+def pressure(chan, value):
+    # Channel pressure packet on cable 0
+    return bytearray((0x0d, 0xd0 | chan, value, 0))
+
+def pop_some(co, data, count):
+    # Deliver up to count pending values, like a flush that runs out of
+    # budget. Returns a list of (channel, value).
+    out = []
+    while len(out) < count and co.pop_into(data):
+        out.append((data[1] & 0x0f, data[2]))
+    return out
+
+def flush(co, now):
+    # Run a whole flush. Returns a list of packets as hex strings.
+    data = bytearray(4)
+    out = []
+    if co.due(now):
+        while co.pop_into(data):
+            out.append(bytes(data).hex())
+    return out
+
+def main():
+    data = bytearray(4)
+
+    # MPE-style channel pressure across 7 channels, with each flush only
+    # getting 1 value out before the budget runs out
+    co = Coalescer(0x0d, keys=1, interval_ms=0)
+    now = 1000
+    got = []
+    try:
+        for n in range(200):
+            for chan in range(1, 8):
+                co.hold(pressure(chan, n & 0x7f))
+            if co.due(now):
+                got += pop_some(co, data, 1)
+            now += 1
+        ok = True
+    except IndexError:
+        ok = False
+    check(ok, 'partial flushes do not overrun the queue')
+    check(len(co) <= 16, 'pending count stays within the slots (got %d)' % (
+        len(co)))
+    check(len(got) > 100, 'values keep coming out of partial flushes '
+        '(got %d)' % len(got))
+
+    # Drain what's left: each channel comes out once, with its latest value
+    rest = []
+    while co.due(now):
+        rest += pop_some(co, data, 16)
+        now += 1
+    chans = sorted(c for (c, v) in rest)
+    check(chans == list(range(1, 8)), 'each channel delivered once '
+        '(got %s)' % chans)
+    check(all(v == 199 & 0x7f for (c, v) in rest), 'latest values delivered')
+
+    # Arrival order survives wrapping around the end of the queue
+    co.clear()
+    for chan in (3, 9, 1):
+        co.hold(pressure(chan, 64))
+    co.due(now)
+    pop_some(co, data, 16)
+    order = [5, 12, 0, 15, 7, 2, 11, 4, 14, 6, 1, 13, 8, 10, 3, 9]
+    for chan in order:
+        co.hold(pressure(chan, 1))
+    now += 1
+    co.due(now)
+    got = [c for (c, v) in pop_some(co, data, 16)]
+    check(got == order, 'delivery order matches arrival order')
+    check(len(co) == 0, 'queue empty after a full flush')
+
+    # A flush delivers what was pending when it started. Values held during
+    # the flush wait for the next one.
+    co.clear()
+    co.hold(pressure(0, 10))
+    co.hold(pressure(1, 11))
+    now += 1
+    co.due(now)
+    first = pop_some(co, data, 1)
+    co.hold(pressure(0, 20))
+    co.hold(pressure(2, 12))
+    second = pop_some(co, data, 16)
+    check(first == [(0, 10)] and second == [(1, 11)],
+        'flush stops at the values pending when it started (got %s %s)' % (
+        first, second))
+    now += 1
+    co.due(now)
+    third = pop_some(co, data, 16)
+    check(third == [(0, 20), (2, 12)], 'next flush gets the rest (got %s)' % (
+        third))
+
+    # The same controller on two cables (like a BeatStep Pro's cables 0
+    # and 1, which may be routed differently) never shares a slot
+    cc = Coalescer(0x0b, keys=128, interval_ms=0)
+    check(cc.hold(bytes((0x0b, 0xb0, 74, 10))), 'cable 0 CC held')
+    check(cc.hold(bytes((0x0b, 0xb0, 74, 11))), 'cable 0 CC merged')
+    check(not cc.hold(bytes((0x1b, 0xb0, 74, 90))),
+        'cable 1 CC with cable 0 pending is not held')
+    now += 1
+    got = flush(cc, now)
+    check(got == ['0bb04a0b'], 'pending CC keeps its cable (got %s)' % got)
+    check(cc.hold(bytes((0x1b, 0xb0, 74, 91))),
+        'cable 1 CC held once the slot is free')
+    now += 1
+    got = flush(cc, now)
+    check(got == ['1bb04a5b'], 'cable 1 CC delivered on cable 1 (got %s)' % (
+        got))
+
+    # Bad key bytes above 127 (like a glitched '0b b0 c8 64') pass straight
+    # through instead of indexing past the end of the tables
+    for cin in (0x0a, 0x0b):
+        co = Coalescer(cin, keys=128, interval_ms=0)
+        try:
+            ok = not co.hold(bytes((cin, cin << 4, 0xc8, 0x64)))
+        except IndexError:
+            ok = False
+        check(ok, 'CIN %x with key byte c8 is not held' % cin)
+
+    if failures:
+        print('FAIL: %d checks failed' % len(failures))
+        sys.exit(1)
+    print('OK')
+
+main()
@@ -0,0 +1,79 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+"""
+Host-side checks for the controller decoder (sb_midi_ctrl.ControllerDecoder).
+
+14-bit controllers send an MSB, then optionally an LSB. Each LSB has to be
+combined with the MSB that came right before it, and an MSB on its own means
+the LSB is 0, so it still has to be reported.
+
+Usage: python3 tools/check_ctrl.py
+"""
+import sys
+
+import host_shim
+from sb_midi_ctrl import ControllerDecoder, CC14, HELD, NRPN, PLAIN, RPN
+
+
+failures = []
+
+def check(ok, label):
+    print('%s: %s' % ('ok  ' if ok else 'FAIL', label))
+    if not ok:
+        failures.append(label)
+
+def cc(dec, ctl, v, chan=0):
+    # Decode one CC on cable 0. Returns (kind, param, value).
+    k = dec.cc(bytes((0x0b, 0xb0 | chan, ctl, v)))
+    if k == PLAIN or k == HELD:
+        return (k,)
+    return (k, dec.param, dec.value)
+
+def main():
+    dec = ControllerDecoder()
+
+    # Mod wheel that only sends MSBs
+    check(cc(dec, 1, 64) == (PLAIN,), 'MSB-only controller is a plain CC')
+
+    # Hi-res controller: MSB 10, LSB 5, MSB 20, LSB 7
+    got = [cc(dec, 7, 10), cc(dec, 39, 5), cc(dec, 7, 20), cc(dec, 39, 7)]
+    check(got[1] == (CC14, 7, (10 << 7) | 5), 'LSB combined with its MSB '
+        '(got %s)' % (got[1],))
+    check(got[2] == (CC14, 7, 20 << 7), 'MSB after an LSB gets reported '
+        '(got %s)' % (got[2],))
+    check(got[3] == (CC14, 7, 2567), 'LSB combined with the new MSB '
+        '(got %s)' % (got[3],))
+
+    # MSB-only changes after the controller has sent an LSB
+    check(cc(dec, 7, 30) == (CC14, 7, 30 << 7), 'bare MSB resets the LSB')
+    check(cc(dec, 7, 31) == (CC14, 7, 31 << 7), 'next bare MSB reported')
+
+    # Other channels keep their own state
+    check(cc(dec, 7, 30, chan=1) == (PLAIN,), 'channel 2 is separate')
+
+    # RPN 0 (pitch bend range): data entry MSB, then LSB
+    check(cc(dec, 101, 0) == (HELD,), 'RPN MSB select held')
+    check(cc(dec, 100, 0) == (HELD,), 'RPN LSB select held')
+    check(cc(dec, 6, 2) == (RPN, 0, 2 << 7), 'data entry MSB reported')
+    check(cc(dec, 38, 50) == (RPN, 0, (2 << 7) | 50), 'data entry LSB')
+    check(cc(dec, 6, 12) == (RPN, 0, 12 << 7), 'bare data entry MSB '
+        'resets the LSB')
+    check(cc(dec, 96, 0) == (RPN, 0, (12 << 7) + 1), 'data increment')
+
+    # NRPN, then the null parameter deselects
+    cc(dec, 99, 1)
+    cc(dec, 98, 2)
+    check(cc(dec, 6, 3) == (NRPN, 130, 3 << 7), 'NRPN data entry')
+    cc(dec, 101, 127)
+    cc(dec, 100, 127)
+    check(cc(dec, 6, 3) == (PLAIN,), 'data entry after null RPN is plain')
+
+    # Bad controller bytes above 127 are plain CCs
+    check(cc(dec, 0xc8, 0x64) == (PLAIN,), 'controller byte c8 is plain')
+
+    if failures:
+        print('FAIL: %d checks failed' % len(failures))
+        sys.exit(1)
+    print('OK')
+
+main()
@@ -0,0 +1,94 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+"""
+Host-side checks for batched MIDI echo (sb_midi_echo.MIDIEcho).
+
+The echo port must get plain MIDI bytes with the right length for each
+packet's CIN (no cable/CIN header bytes), and each batch of packets must go
+out in a single write call.
+
+Usage: python3 tools/check_echo.py
+"""
+import sys
+
+import host_shim
+from sb_midi_echo import MIDIEcho
+
+
+failures = []
+
+def check(ok, label):
+    print('%s: %s' % ('ok  ' if ok else 'FAIL', label))
+    if not ok:
+        failures.append(label)
+
+class FakePort:
+    # Records the bytes from each write call like usb_midi.PortOut would
+    def __init__(self):
+        self.writes = []
+
+    def write(self, buf):
+        self.writes.append(bytes(buf))
+
+def echo_batch(echo, packets):
+    for p in packets:
+        echo.add(bytes(p))
+    echo.flush()
+
+def main():
+    port = FakePort()
+    echo = MIDIEcho(port.write)
+
+    # One full 64-byte transfer of mixed channel messages on cable 1
+    packets = [
+        (0x19, 0x90, 60, 100),  # note on
+        (0x18, 0x80, 60, 0),    # note off
+        (0x1a, 0xa0, 60, 33),   # poly pressure
+        (0x1b, 0xb0, 1, 64),    # cc
+        (0x1c, 0xc0, 5, 0),     # program change (2 bytes)
+        (0x1d, 0xd0, 90, 0),    # channel pressure (2 bytes)
+        (0x1e, 0xe0, 0, 64),    # pitch bend
+        (0x1f, 0xf8, 0, 0),     # timing clock (1 byte)
+    ] * 2
+    echo_batch(echo, packets)
+    want = bytes([0x90, 60, 100, 0x80, 60, 0, 0xa0, 60, 33, 0xb0, 1, 64,
+        0xc0, 5, 0xd0, 90, 0xe0, 0, 64, 0xf8]) * 2
+    check(port.writes == [want], 'channel messages in one write')
+
+    # SysEx split across packets, with System Common and reserved CINs
+    port.writes.clear()
+    echo_batch(echo, [
+        (0x04, 0xf0, 0x7e, 0x7f),   # SysEx start
+        (0x04, 0x06, 0x01, 0x02),   # SysEx continue
+        (0x06, 0x03, 0xf7, 0),      # SysEx end with 2 bytes
+        (0x05, 0xf6, 0, 0),         # tune request (1 byte System Common)
+        (0x00, 0x11, 0x22, 0x33),   # reserved CIN (skipped)
+        (0x02, 0xf3, 7, 0),         # song select (2 bytes System Common)
+        (0x07, 0x01, 0x02, 0xf7),   # SysEx end with 3 bytes
+    ])
+    want = bytes([0xf0, 0x7e, 0x7f, 0x06, 0x01, 0x02, 0x03, 0xf7, 0xf6,
+        0xf3, 7, 0x01, 0x02, 0xf7])
+    check(port.writes == [want], 'SysEx and System Common in one write')
+
+    # Nothing queued means no write at all
+    port.writes.clear()
+    echo.flush()
+    check(port.writes == [], 'empty flush does not write')
+
+    # More packets than the buffer holds get split into as few writes as
+    # possible, without losing or reordering anything
+    port.writes.clear()
+    notes = [(0x09, 0x90, n, 100) for n in range(100)]
+    echo_batch(echo, notes)
+    want = b''.join([bytes(p[1:]) for p in notes])
+    check(b''.join(port.writes) == want, 'overflow keeps every byte')
+    check(len(port.writes) == 2, 'overflow takes 2 writes (got %d)' % (
+        len(port.writes)))
+    check(echo.writes == 4, 'write counter (got %d)' % echo.writes)
+
+    if failures:
+        print('FAIL: %d checks failed' % len(failures))
+        sys.exit(1)
+    print('OK')
+
+main()
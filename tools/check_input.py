@@ -0,0 +1,180 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+"""
+Host-side checks for MIDIInputDevice scheduling with fake usb.core devices.
+
+This covers reading from interfaces with several IN endpoints and from
+several devices behind a hub: every packet must come through exactly once,
+tagged with the right endpoint or device, the round-robin schedule must not
+starve anything, and an unplugged device must not stall the others.
+
+Usage: python3 tools/check_input.py
+"""
+import contextlib
+import io
+import sys
+
+import host_shim
+from host_shim import FakeDevice
+import sb_usb_midi
+
+
+failures = []
+
+def check(ok, label):
+    print('%s: %s' % ('ok  ' if ok else 'FAIL', label))
+    if not ok:
+        failures.append(label)
+
+def open_device(fake):
+    host_shim.detach_all()
+    host_shim.attach(fake)
+    cache = {}
+    r = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        while r is None:
+            r = sb_usb_midi.find_usb_device(cache)
+        return sb_usb_midi.MIDIInputDevice(r)
+
+def note(cable, n):
+    return bytes([(cable << 4) | 0x09, 0x90, n, 100])
+
+def check_multi_endpoint():
+    # Endpoint 0x81 floods with full transfers, 0x82 sends an occasional
+    # packet on cable 1, and both eventually go quiet
+    script = []
+    for i in range(6):
+        xfer = b''.join([note(0, i * 16 + j) for j in range(16)])
+        script.append((0x81, xfer))
+        script.append((0x82, note(1, i) if i % 2 == 0 else None))
+    script += [(0x81, None), (0x82, None)] * 100
+    dev = open_device(FakeDevice(script, in_addrs=(0x81, 0x82)))
+    check(len(dev.endpoints_in) == 2, 'found both IN endpoints')
+    got = {0: [], 1: []}
+    order = []
+    idle = 0
+    for data in dev.input_event_generator():
+        if data is None:
+            idle += 1
+            if idle > 3:
+                break
+            continue
+        ep = dev.endpoint_index
+        got[ep].append(bytes(data))
+        if not order or order[-1] != ep:
+            order.append(ep)
+    check(len(got[0]) == 96, 'all 96 packets from busy endpoint')
+    check(got[1] == [note(1, 0), note(1, 2), note(1, 4)],
+        'all packets from quiet endpoint, tagged with its index')
+    check(all(p[0] >> 4 == 0 for p in got[0]), 'busy endpoint tags')
+    check(order == [0, 1, 0, 1, 0, 1, 0], 'round-robin merge order')
+
+def check_busy_poll():
+    # While one endpoint is busy, idle endpoints get a short poll timeout
+    script = [(0x81, note(0, 1)), (0x81, note(0, 2)), (0x82, None)]
+    fake = FakeDevice(script, in_addrs=(0x81, 0x82))
+    dev = open_device(fake)
+    gen = dev.input_batch_generator()
+    next(gen)
+    next(gen)
+    check(fake.last_timeout == sb_usb_midi._BUSY_POLL_MS,
+        'short poll timeout for idle endpoint during activity')
+
+def logged_reads(fake, log):
+    # Record (endpoint address, timeout) for every read from a fake device
+    read = fake.read
+    def logged_read(endpoint, size_or_buffer, timeout=None):
+        log.append((endpoint, timeout))
+        return read(endpoint, size_or_buffer, timeout)
+    fake.read = logged_read
+
+def check_idle_poll():
+    # Once everything is quiet, only one endpoint per pass gets the long
+    # (adaptive) timeout, taking turns, and the others get a short poll
+    fake = FakeDevice([(0x81, None), (0x82, None)], in_addrs=(0x81, 0x82))
+    log = []
+    logged_reads(fake, log)
+    dev = open_device(fake)
+    gen = dev.input_batch_generator()
+    for _ in range(4):
+        next(gen)
+    slow = sb_usb_midi.ReadTimeout().min_ms
+    fast = sb_usb_midi._BUSY_POLL_MS
+    check(log == [(0x81, slow), (0x82, fast), (0x81, fast), (0x82, slow)] * 2,
+        'one long timeout per idle pass, taking turns')
+
+def check_hub():
+    # Three identical controllers on a hub. The second one gets unplugged
+    # after two transfers, and the third is mostly quiet.
+    host_shim.detach_all()
+    a = [note(0, i) for i in range(10)] + [None] * 40
+    b = [note(0, 100), note(0, 101)]
+    c = [None, None, None, note(0, 50)] + [None] * 40
+    host_shim.attach(FakeDevice(a, port=1))
+    host_shim.attach(FakeDevice(b, port=2, loop=False))
+    host_shim.attach(FakeDevice(c, port=3))
+    with contextlib.redirect_stdout(io.StringIO()):
+        found = sb_usb_midi.find_usb_devices({})
+        mgr = sb_usb_midi.MIDIDeviceManager(found)
+        got = {}
+        idle = 0
+        for xfer in mgr.input_batch_generator():
+            if xfer is None:
+                idle += 1
+                if idle > 3:
+                    break
+                continue
+            (data, n) = xfer
+            port = mgr.devices[mgr.device_index].device.port_numbers[0]
+            got.setdefault(port, []).append(bytes(data[:n]))
+    check(len(found) == 3, 'found all three identical devices')
+    check(got.get(1) == a[:10], 'all packets from busy device, in order')
+    check(got.get(2) == b, 'packets from unplugged device before unplug')
+    check(got.get(3) == [note(0, 50)], 'packet from quiet device')
+    check(len(mgr.devices) == 2 and len(mgr.dropped) == 1,
+        'unplugged device was dropped')
+
+def check_hub_idle_poll():
+    # The manager uses the same schedule across devices: on idle passes,
+    # only one device's endpoint gets the long timeout
+    host_shim.detach_all()
+    log = []
+    for port in (1, 2, 3):
+        fake = FakeDevice([None], port=port)
+        logged_reads(fake, log)
+        host_shim.attach(fake)
+    with contextlib.redirect_stdout(io.StringIO()):
+        mgr = sb_usb_midi.MIDIDeviceManager(sb_usb_midi.find_usb_devices({}))
+    gen = mgr.input_batch_generator()
+    for _ in range(3):
+        next(gen)
+    slow = sb_usb_midi.ReadTimeout().min_ms
+    fast = sb_usb_midi._BUSY_POLL_MS
+    check([t for (_, t) in log] == [slow, fast, fast, fast, slow, fast,
+        fast, fast, slow], 'one long timeout per idle pass across devices')
+
+def check_hub_all_gone():
+    # Once every device is unplugged, the manager raises USBError
+    host_shim.detach_all()
+    host_shim.attach(FakeDevice([note(0, 1)], port=1, loop=False))
+    with contextlib.redirect_stdout(io.StringIO()):
+        mgr = sb_usb_midi.MIDIDeviceManager(sb_usb_midi.find_usb_devices({}))
+        try:
+            for xfer in mgr.input_batch_generator():
+                pass
+            ok = False
+        except sb_usb_midi.USBError:
+            ok = True
+    check(ok, 'USBError when all devices are gone')
+
+def main():
+    check_multi_endpoint()
+    check_busy_poll()
+    check_idle_poll()
+    check_hub()
+    check_hub_idle_poll()
+    check_hub_all_gone()
+    if failures:
+        sys.exit(1)
+
+main()
@@ -0,0 +1,150 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+"""
+CPython stand-ins for the CircuitPython modules used by the sb_*.py drivers.
+
+Importing this module installs fake `micropython`, `usb`, and `usb.core`
+modules in sys.modules and adds the repo root to sys.path. That lets the
+host-side tools in this directory import the driver code unmodified.
+
+FakeDevice answers descriptor requests like a class compliant USB MIDI
+device, then plays back a script of bulk transfers from its read() method.
+"""
+import os.path
+import sys
+import types
+
+
+class USBError(OSError):
+    pass
+
+class USBTimeoutError(USBError):
+    pass
+
+
+# Registry of attached fake devices, as returned by usb.core.find()
+_devices = []
+
+def find(find_all=False, **kwargs):
+    if find_all:
+        return list(_devices)
+    return _devices[0] if _devices else None
+
+def attach(device):
+    _devices.append(device)
+    return device
+
+def detach_all():
+    del _devices[:]
+
+
+def _device_desc(vid, pid):
+    return bytes([
+        18, 0x01, 0x00, 0x02,      # bLength, DEVICE, bcdUSB 2.00
+        0x00, 0x00, 0x00, 64,      # class/subclass/proto from interface
+        vid & 0xff, vid >> 8, pid & 0xff, pid >> 8,
+        0x00, 0x01, 1, 2, 0, 1])   # bcdDevice, strings, 1 configuration
+
+def _config_desc(in_addrs, out_addrs):
+    ep = b''
+    for addr in list(out_addrs) + list(in_addrs):
+        ep += bytes([7, 0x05, addr, 0x02, 64, 0, 0])  # bulk, 64 byte packets
+    n_ep = len(in_addrs) + len(out_addrs)
+    body = (
+        bytes([9, 0x04, 0, 0, 0, 0x01, 0x01, 0, 0])      # Audio Control
+        + bytes([9, 0x04, 1, 0, n_ep, 0x01, 0x03, 0, 0]) # MIDI Streaming
+        + ep)
+    total = 9 + len(body)
+    return bytes([9, 0x02, total & 0xff, total >> 8, 2, 1, 0, 0x80, 50]) + body
+
+
+class FakeDevice:
+    def __init__(self, script, vid=0x1c75, pid=0x0288, in_addrs=(0x81,),
+            out_addrs=(0x01,), loop=True, port=1):
+        # Make a fake usb.core.Device for a USB MIDI device
+        # - script: list of transfers to return from read(). Each item is
+        #   bytes (0 or more 4-byte packets) or None (read timeout). Items
+        #   may also be (endpoint_address, bytes) to target one IN endpoint.
+        # - loop: True to replay the script forever, False to raise USBError
+        #   (like an unplugged device) once the script runs out
+        # - port: hub port number (lets identical devices be told apart)
+        self.idVendor = vid
+        self.idProduct = pid
+        self.port_numbers = (port,)
+        self.in_addrs = tuple(in_addrs)
+        self.out_addrs = tuple(out_addrs)
+        self.loop = loop
+        self.configured = False
+        self.last_timeout = None
+        self._desc = {
+            0x01: _device_desc(vid, pid),
+            0x02: _config_desc(self.in_addrs, self.out_addrs),
+        }
+        self._queues = {}
+        for addr in self.in_addrs:
+            self._queues[addr] = []
+        for item in script:
+            if isinstance(item, tuple):
+                (addr, xfer) = item
+            else:
+                (addr, xfer) = (self.in_addrs[0], item)
+            # Keeping transfers as bytearrays lets read() copy them without
+            # allocating (copying from bytes makes a temporary object), so
+            # allocation checks only see what the driver code allocates
+            if xfer is not None:
+                xfer = bytearray(xfer)
+            self._queues[addr].append(xfer)
+        self._cursor = dict((a, 0) for a in self.in_addrs)
+
+    def ctrl_transfer(self, bmRequestType, bRequest, wValue=0, wIndex=0,
+            data_or_wLength=None, timeout=None):
+        d = self._desc.get(wValue >> 8, b'')
+        n = min(len(d), len(data_or_wLength))
+        data_or_wLength[0:n] = d[0:n]
+        return n
+
+    def is_kernel_driver_active(self, interface):
+        return False
+
+    def detach_kernel_driver(self, interface):
+        pass
+
+    def set_configuration(self, configuration=None):
+        self.configured = True
+
+    def read(self, endpoint, size_or_buffer, timeout=None):
+        self.last_timeout = timeout
+        q = self._queues[endpoint]
+        i = self._cursor[endpoint]
+        if i >= len(q):
+            if not self.loop and q:
+                raise USBError('No such device (it may have been unplugged)')
+            if not q:
+                raise USBTimeoutError('timeout')
+            i = 0
+        self._cursor[endpoint] = i + 1
+        xfer = q[i]
+        if xfer is None:
+            raise USBTimeoutError('timeout')
+        n = len(xfer)
+        size_or_buffer[0:n] = xfer
+        return n
+
+
+def _install():
+    mp = types.ModuleType('micropython')
+    mp.const = lambda x: x
+    usb = types.ModuleType('usb')
+    core = types.ModuleType('usb.core')
+    core.USBError = USBError
+    core.USBTimeoutError = USBTimeoutError
+    core.find = find
+    usb.core = core
+    sys.modules.setdefault('micropython', mp)
+    sys.modules.setdefault('usb', usb)
+    sys.modules.setdefault('usb.core', core)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+
+_install()
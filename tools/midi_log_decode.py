@@ -0,0 +1,156 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: Copyright 2025 Sam Blenny
+"""
+Decode a binary MIDI serial log capture back into the text log format.
+
+When the tester runs with MIDI_LOG_MODE = "binary" in settings.toml, it
+streams 10-byte records (see sb_midi_binlog.py) over the serial console
+instead of text. This reads a capture of that stream (a file, or stdin),
+and prints the same text lines the tester would have logged in text mode.
+
+The capture is processed in chunks, so multi-hour captures don't need to
+fit in memory. Bytes that aren't part of a valid record, such as print()
+output from the tester or line noise, are skipped by scanning for the sync
+marker and checking each record's check byte.
+
+Usage:
+    python3 tools/midi_log_decode.py [-t] [capture_file]
+
+    -t: prefix each line with the time in seconds since the first record
+
+Example capture on macOS or Linux (115200 baud, raw mode):
+    stty -f /dev/tty.usbmodem* raw 115200 && cat /dev/tty.usbmodem* > cap.bin
+"""
+import argparse
+import sys
+
+import host_shim
+from sb_midi_binlog import RECORD_LEN, SYNC0, SYNC1, TIME_MASK
+from sb_midi_ctrl import ControllerDecoder, HELD, PLAIN
+import sb_midi_fmt as fmt
+from sb_midi_sysex import SysExAssembler
+
+
+CHUNK_SIZE = 65536
+CC_TAGS = (None, None, b'C14 ', b'RPN ', b'NRP ')   # same as code.py
+
+
+class Stats:
+    def __init__(self):
+        self.records = 0
+        self.skipped = 0    # bytes that were not part of a valid record
+
+
+def records(stream, stats):
+    # Generate (ticks, packet) tuples from a binary log stream, where ticks
+    # is the record's ticks_ms() timestamp modulo 2**24
+    buf = bytearray()
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        buf += chunk
+        i = 0
+        end = len(buf) - RECORD_LEN
+        while i <= end:
+            if buf[i] == SYNC0 and buf[i+1] == SYNC1:
+                chk = 0
+                for b in buf[i+2:i+9]:
+                    chk ^= b
+                if chk == buf[i+9]:
+                    t = buf[i+2] | (buf[i+3] << 8) | (buf[i+4] << 16)
+                    stats.records += 1
+                    yield (t, bytes(buf[i+5:i+9]))
+                    i += RECORD_LEN
+                    continue
+            # Not a valid record here, so slide forward one byte and resync
+            stats.skipped += 1
+            i += 1
+        del buf[:i]
+    stats.skipped += len(buf)
+
+
+class TextDecoder:
+    # Turn usb midi packets into log lines, matching code.py's text mode
+
+    def __init__(self):
+        self.out = bytearray(64)
+        self.sysex = SysExAssembler(256)
+        self.ctrl = ControllerDecoder()
+
+    def line(self, data):
+        # Format one packet
+        # - returns: log line as a str, or None if the packet doesn't make
+        #   a line of its own (filtered, or part of an unfinished SysEx)
+        out = self.out
+        cin = data[0] & 0x0f
+        chan = (data[1] & 0x0f) + 1
+        if cin == 0x0f and data[1] >= 0xf8:
+            return None
+        if cin == 0x08:
+            n = fmt.event(out, 0, b'Off ', chan, data[2], data[3])
+        elif cin == 0x09:
+            n = fmt.event(out, 0, b'On  ', chan, data[2], data[3])
+        elif cin == 0x0a:
+            n = fmt.event(out, 0, b'PP  ', chan, data[2], data[3])
+        elif cin == 0x0b:
+            k = self.ctrl.cc(data)
+            if k == HELD:
+                return None
+            if k == PLAIN:
+                n = fmt.event(out, 0, b'CC  ', chan, data[2], data[3])
+            else:
+                n = fmt.event(out, 0, CC_TAGS[k], chan, self.ctrl.param,
+                    self.ctrl.value)
+        elif cin == 0x0d:
+            n = fmt.event(out, 0, b'CP  ', chan, data[2])
+        elif cin == 0x0e:
+            n = fmt.event(out, 0, b'PB  ', chan, self.ctrl.pitch_bend(data))
+        elif 0x04 <= cin <= 0x07 and (cin != 0x05 or data[1] == 0xf7):
+            sx = self.sysex.feed(data)
+            if sx is None:
+                return None
+            hexdump = ' '.join(['%02x' % b for b in sx[:8]])
+            more = '...' if (self.sysex.length > 8) else ''
+            return 'SX  %d %s%s\n' % (self.sysex.length, hexdump, more)
+        else:
+            n = fmt.hexdump(out, 0, data)
+        return str(out[:n], 'ascii')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Decode a binary MIDI serial log capture to text')
+    parser.add_argument('-t', '--time', action='store_true',
+        help='prefix lines with seconds since the first record')
+    parser.add_argument('capture', nargs='?',
+        help='capture file (default: read stdin)')
+    args = parser.parse_args()
+    stream = open(args.capture, 'rb') if args.capture else sys.stdin.buffer
+    stats = Stats()
+    decoder = TextDecoder()
+    write = sys.stdout.write
+    ms = 0
+    prev = None
+    try:
+        for (t, packet) in records(stream, stats):
+            # Timestamps are absolute, so skipped records don't throw off
+            # the times of later ones
+            if prev is not None:
+                ms += (t - prev) & TIME_MASK
+            prev = t
+            line = decoder.line(packet)
+            if line is None:
+                continue
+            if args.time:
+                write('%10.3f ' % (ms / 1000))
+            write(line)
+    except BrokenPipeError:
+        pass
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+    print('%d records, %d bytes skipped' % (stats.records, stats.skipped),
+        file=sys.stderr)
+
+main()